@@ -1,4 +1,4 @@
-from fastapi import FastAPI, APIRouter, Query, HTTPException, Response
+from fastapi import FastAPI, APIRouter, Query, HTTPException, Response, Header
 from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
@@ -7,20 +7,55 @@ import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional, Dict, Any, Union
+from typing import List, Optional, Dict, Any, Union, Callable, Awaitable, Tuple
 import uuid
 from datetime import datetime, timezone, timedelta
-from bson import ObjectId
+from contextlib import asynccontextmanager, contextmanager
+from collections import OrderedDict
+from bson import ObjectId, json_util
+from pymongo import UpdateOne, IndexModel, ReturnDocument
+from pymongo.errors import DuplicateKeyError, BulkWriteError
 import json
+import re
+import hashlib
+import functools
+import inspect
+import unicodedata
 import io
+import base64
+import zlib
 import csv
+import time
+import asyncio
+import typer
+import tempfile
+import array
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet/Arrow exports are disabled without pyarrow
+    pa = None
+    pq = None
+
+try:
+    import orjson
+except ImportError:  # responses fall back to the stdlib json encoder
+    orjson = None
+
+try:
+    import fcntl
+except ImportError:  # cross-worker request coalescing needs POSIX file locks
+    fcntl = None
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", "100"))
+client = AsyncIOMotorClient(mongo_url, maxPoolSize=MONGO_MAX_POOL_SIZE)
 db = client[os.environ['DB_NAME']]
 
 # Create the main app
@@ -42,6 +77,7 @@ class VerificationAction(BaseModel):
     action: str  # verify, flag, unverify
     note: Optional[str] = None
     adminId: str = "SAI_ADMIN_001"
+    expectedVersion: Optional[int] = Field(None, ge=0)  # 409 unless verification.version still matches
 
 class QueryFilter(BaseModel):
     filters: Optional[Dict[str, Any]] = {}
@@ -50,6 +86,24 @@ class QueryFilter(BaseModel):
     aggregate: Optional[List[Dict[str, Any]]] = []
     page: int = 1
     limit: int = 25
+    view: Optional[str] = None  # table, card, full
+    fields: Optional[List[str]] = None
+
+class BulkVerificationAction(BaseModel):
+    candidateIds: List[str] = Field(..., min_length=1, max_length=1000)
+    action: str  # verify, flag, unverify
+    note: Optional[str] = None
+    adminId: str = "SAI_ADMIN_001"
+
+class ExportJobRequest(BaseModel):
+    format: str = "csv"  # csv, json, ndjson, parquet, arrow
+    type: str = "candidates"  # candidates, test-results
+    state: Optional[str] = None
+    gender: Optional[str] = None
+    verificationStatus: Optional[str] = None
+    testType: Optional[str] = None
+    limit: Optional[int] = Field(None, ge=1)
+    adminId: str = "SAI_ADMIN_001"
 
 class AuditLogEntry(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -89,9 +143,61 @@ def serialize_doc(doc: dict) -> dict:
             result[key] = value
     return result
 
-async def log_audit(admin_id: str, action: str, target_id: str, target_type: str, before: dict = None, after: dict = None, note: str = None):
-    """Log an admin action to audit collection"""
-    audit_entry = {
+def prepare_doc(doc: dict) -> dict:
+    """Rename _id to id like serialize_doc, leaving ObjectId/datetime values to the response encoder"""
+    if doc is None:
+        return None
+    result = {}
+    for key, value in doc.items():
+        if key == '_id':
+            # Handle grouped _id which can be a dict
+            if isinstance(value, dict):
+                result['_id'] = value
+            result['id'] = str(value)
+        elif isinstance(value, dict):
+            result[key] = prepare_doc(value)
+        elif isinstance(value, list):
+            result[key] = [prepare_doc(v) if isinstance(v, dict) else v for v in value]
+        else:
+            result[key] = value
+    return result
+
+def response_json_default(value: Any) -> Any:
+    """Encode the BSON scalars serialize_doc used to convert up front"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+def render_json(content: Any) -> bytes:
+    """Encode a response body, using orjson when available.
+    
+    The two encoders produce the same JSON values but not always the same bytes:
+    orjson formats some floats differently (1e16 vs 1e+16, 1e-7 vs 1e-07).
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(content, default=response_json_default, option=ORJSON_OPTIONS)
+        except TypeError:
+            # e.g. integers beyond 64 bits, which the stdlib encoder still handles
+            pass
+    return json.dumps(content, default=response_json_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+class FastJSONResponse(Response):
+    """JSON response rendered by render_json, accepting raw MongoDB documents"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return render_json(content)
+
+def audit_entry(admin_id: str, action: str, target_id: str, target_type: str, before: dict = None, after: dict = None, note: str = None) -> dict:
+    """Build an admin_audit document"""
+    return {
+        # Assigned up front so a batch retried after a timeout cannot duplicate it
+        "_id": ObjectId(),
         "id": str(uuid.uuid4()),
         "adminId": admin_id,
         "action": action,
@@ -102,26 +208,3040 @@ async def log_audit(admin_id: str, action: str, target_id: str, target_type: str
         "note": note,
         "timestamp": datetime.now(timezone.utc).isoformat()
     }
-    await db.admin_audit.insert_one(audit_entry)
-    return audit_entry
+
+async def log_audit_many(entries: List[dict]):
+    """Write audit entries built by audit_entry.
+    
+    While the audit writer runs the entries are queued and written in a later batch;
+    otherwise (CLI commands, shutdown) they are inserted directly with one insert_many.
+    """
+    if not entries:
+        return
+    if audit_writer.accepting:
+        for entry in entries:
+            await audit_writer.submit(entry)
+    else:
+        await db.admin_audit.insert_many(entries, ordered=False)
+        await bump_cache_versions("admin_audit")
+
+async def log_audit(admin_id: str, action: str, target_id: str, target_type: str, before: dict = None, after: dict = None, note: str = None):
+    """Log an admin action to audit collection"""
+    entry = audit_entry(admin_id, action, target_id, target_type, before, after, note)
+    await log_audit_many([entry])
+    return entry
 
 def build_mongo_filter(filters: Dict[str, Any]) -> Dict[str, Any]:
     """Convert UI filters to MongoDB query format"""
     mongo_filter = {}
     
-    for key, value in filters.items():
-        if key == '$or' or key == '$and':
-            mongo_filter[key] = value
-        elif isinstance(value, dict):
-            # Handle operators like $gt, $lt, $gte, $lte
-            mongo_filter[key] = value
-        elif isinstance(value, list):
-            # Handle $in queries
-            mongo_filter[key] = {"$in": value}
-        else:
-            mongo_filter[key] = value
+    for key, value in filters.items():
+        if key == '$or' or key == '$and':
+            mongo_filter[key] = value
+        elif isinstance(value, dict):
+            # Handle operators like $gt, $lt, $gte, $lte
+            mongo_filter[key] = value
+        elif isinstance(value, list):
+            # Handle $in queries
+            mongo_filter[key] = {"$in": value}
+        else:
+            mongo_filter[key] = value
+    
+    return mongo_filter
+
+def to_object_id(value: Any) -> Optional[ObjectId]:
+    """Normalise an ObjectId or its hex string, None for anything else"""
+    if isinstance(value, ObjectId):
+        return value
+    if isinstance(value, str) and ObjectId.is_valid(value):
+        return ObjectId(value)
+    return None
+
+async def fetch_user_map(user_ids: List[Any]) -> Dict[str, Dict[str, str]]:
+    """Name/state/city for a set of user ids in one batched query"""
+    object_ids = list({oid for oid in (to_object_id(uid) for uid in user_ids) if oid})
+    if not object_ids:
+        return {}
+    users = await db.users.find(
+        {"_id": {"$in": object_ids}},
+        {"name": 1, "state": 1, "city": 1}
+    ).to_list(len(object_ids))
+    return {
+        str(user["_id"]): {
+            "name": user.get("name", "Unknown"),
+            "state": user.get("state", ""),
+            "city": user.get("city", "")
+        }
+        for user in users
+    }
+
+# Name searches resolve to a userId $in list; broader prefixes are answered with a
+# users $lookup instead of a command that approaches MongoDB's 16MB limit
+SEARCH_MAX_USER_IDS = int(os.environ.get("SEARCH_MAX_USER_IDS", "5000"))
+
+async def find_user_ids_by_search(search: str) -> Optional[List[Any]]:
+    """Ids of users matching a candidate search, in both stored userId forms (None when too many for $in)"""
+    search_filter = build_search_filter(search)
+    if not search_filter:
+        return []
+    users = await db.users.find(search_filter, {"_id": 1}).limit(SEARCH_MAX_USER_IDS + 1).to_list(SEARCH_MAX_USER_IDS + 1)
+    if len(users) > SEARCH_MAX_USER_IDS:
+        return None
+    ids = [u["_id"] for u in users]
+    return ids + [str(uid) for uid in ids]
+
+def search_join_stages(search: str) -> List[Dict[str, Any]]:
+    """Keep only test results whose user matches a candidate search"""
+    return [
+        {"$lookup": {
+            "from": "users",
+            "let": {"uid": {"$convert": {"input": "$userId", "to": "objectId", "onError": "$userId", "onNull": None}}},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$_id", "$$uid"]}}},
+                {"$match": build_search_filter(search)},
+                {"$project": {"_id": 1}}
+            ],
+            "as": "searchUser"
+        }},
+        {"$match": {"searchUser.0": {"$exists": True}}},
+        {"$project": {"searchUser": 0}}
+    ]
+
+def parse_sort(sort: Optional[str], default_field: str, default_direction: int = -1) -> tuple:
+    """Parse a `field:dir` sort parameter into (field, direction)"""
+    if not sort:
+        return default_field, default_direction
+    parts = sort.split(":")
+    return parts[0], -1 if len(parts) > 1 and parts[1] == "desc" else 1
+
+def get_path(doc: dict, path: str) -> Any:
+    """Read a dotted path from a document, None when absent"""
+    for part in path.split("."):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(part)
+    return doc
+
+def encode_cursor(payload: Dict[str, Any]) -> str:
+    """Opaque, URL-safe page token (extended JSON keeps ObjectId/datetime types)"""
+    return base64.urlsafe_b64encode(json_util.dumps(payload).encode()).decode().rstrip("=")
+
+def decode_cursor(token: str) -> Dict[str, Any]:
+    try:
+        payload = json_util.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        if not isinstance(payload, dict) or not {"f", "d", "v", "id", "b"} <= payload.keys():
+            raise ValueError("missing keys")
+        return payload
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def keyset_filter(field: str, direction: int, value: Any, last_id: Any, forward: bool = True) -> Dict[str, Any]:
+    """Range seek past (value, _id) for a [(field, direction), (_id, direction)] sort"""
+    ascending = (direction == 1) == forward
+    op = "$gt" if ascending else "$lt"
+    if field == "_id":
+        return {"_id": {op: last_id}}
+    if value is None:
+        # Nulls sort before every other value
+        if ascending:
+            return {"$or": [{field: None, "_id": {op: last_id}}, {field: {"$ne": None}}]}
+        return {field: None, "_id": {op: last_id}}
+    clauses = [{field: {op: value}}, {field: value, "_id": {op: last_id}}]
+    if not ascending:
+        clauses.append({field: None})
+    return {"$or": clauses}
+
+def sort_spec(field: str, direction: int, forward: bool = True) -> List[tuple]:
+    """Sort with an _id tiebreaker so keyset positions are unique"""
+    if not forward:
+        direction = -direction
+    if field == "_id":
+        return [("_id", direction)]
+    return [(field, direction), ("_id", direction)]
+
+def page_cursors(docs: List[dict], field: str, direction: int, has_more: bool, forward: bool, has_previous: bool) -> Dict[str, Optional[str]]:
+    """Build nextCursor/prevCursor tokens for a page of documents"""
+    def token(doc, before):
+        return encode_cursor({"f": field, "d": direction, "v": get_path(doc, field), "id": doc["_id"], "b": before})
+    if not docs:
+        return {"nextCursor": None, "prevCursor": None}
+    more_after = has_more if forward else True
+    more_before = has_previous if forward else has_more
+    return {
+        "nextCursor": token(docs[-1], False) if more_after else None,
+        "prevCursor": token(docs[0], True) if more_before else None
+    }
+
+async def timed(timings: Dict[str, float], label: str, awaitable):
+    """Await and record elapsed milliseconds under label"""
+    start = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        timings[label] = (time.perf_counter() - start) * 1000
+
+# Independent queries of one request run concurrently, but a single request may only
+# hold a slice of the connection pool so concurrent requests do not starve each other
+QUERY_FANOUT_LIMIT = int(os.environ.get("QUERY_FANOUT_LIMIT", str(max(2, MONGO_MAX_POOL_SIZE // 10))))
+
+async def fan_out(*calls: Callable[[], Awaitable[Any]], limit: Optional[int] = None) -> List[Any]:
+    """Run independent DB calls concurrently, at most QUERY_FANOUT_LIMIT at a time.
+    
+    Calls are zero-argument callables so that no query starts before it holds a slot.
+    """
+    semaphore = asyncio.Semaphore(limit or QUERY_FANOUT_LIMIT)
+    
+    async def run(call):
+        async with semaphore:
+            return await call()
+    return await asyncio.gather(*(run(call) for call in calls))
+
+def format_server_timing(timings: Dict[str, float]) -> str:
+    """Render timings as a Server-Timing header value"""
+    return ", ".join(f"{label};dur={ms:.1f}" for label, ms in timings.items())
+
+# ============ DASHBOARD AGGREGATIONS ============
+
+# Users side of the dashboard: a single collection pass feeding every facet
+DASHBOARD_USERS_PIPELINE = [
+    {"$facet": {
+        "counts": [
+            {"$group": {
+                "_id": None,
+                "total": {"$sum": 1},
+                "verified": {"$sum": {"$cond": [{"$eq": ["$verification.status", "verified"]}, 1, 0]}},
+                "flagged": {"$sum": {"$cond": [{"$eq": ["$verification.status", "flagged"]}, 1, 0]}}
+            }}
+        ],
+        "categories": [
+            {"$group": {
+                "_id": None,
+                "avgStrength": {"$avg": "$categoryScores.strength"},
+                "avgEndurance": {"$avg": "$categoryScores.endurance"},
+                "avgFlexibility": {"$avg": "$categoryScores.flexibility"},
+                "avgAgility": {"$avg": "$categoryScores.agility"},
+                "avgSpeed": {"$avg": "$categoryScores.speed"}
+            }}
+        ],
+        "byState": [
+            {"$group": {
+                "_id": "$state",
+                "count": {"$sum": 1},
+                "avgXP": {"$avg": "$currentXP"}
+            }},
+            {"$sort": {"count": -1}},
+            {"$limit": 10}
+        ]
+    }}
+]
+
+# Recent candidates are a separate indexed top-k: $facet sub-pipelines cannot use
+# indexes, so sorting there would sort the whole users collection in memory
+DASHBOARD_RECENT_LIMIT = 5
+
+# Testresults side of the dashboard
+DASHBOARD_TESTS_PIPELINE = [
+    {"$facet": {
+        "counts": [
+            {"$group": {"_id": None, "total": {"$sum": 1}}}
+        ],
+        "byTestType": [
+            {"$group": {
+                "_id": "$testType",
+                "count": {"$sum": 1},
+                "avgScore": {"$avg": "$comparisonScore"}
+            }},
+            {"$sort": {"count": -1}},
+            {"$limit": 20}
+        ],
+        "ratings": [
+            {"$group": {
+                "_id": "$performanceRating",
+                "count": {"$sum": 1}
+            }},
+            {"$limit": 10}
+        ]
+    }}
+]
+
+async def compute_live_dashboard(timings: Dict[str, float]) -> Dict[str, Any]:
+    """Compute dashboard stats straight from users/testresults"""
+    # One $facet pass per collection plus the recent candidates, all in parallel
+    users_facet, tests_facet, recent_users = await fan_out(
+        lambda: timed(timings, "users", db.users.aggregate(DASHBOARD_USERS_PIPELINE).to_list(1)),
+        lambda: timed(timings, "testresults", db.testresults.aggregate(DASHBOARD_TESTS_PIPELINE).to_list(1)),
+        lambda: timed(timings, "recent", db.users.find().sort("createdAt", -1).limit(DASHBOARD_RECENT_LIMIT).to_list(DASHBOARD_RECENT_LIMIT))
+    )
+    users_stats = users_facet[0] if users_facet else {}
+    tests_stats = tests_facet[0] if tests_facet else {}
+    
+    counts = users_stats.get("counts") or [{}]
+    total_candidates = counts[0].get("total", 0)
+    verified_count = counts[0].get("verified", 0)
+    flagged_count = counts[0].get("flagged", 0)
+    pending_count = total_candidates - verified_count - flagged_count
+    
+    category_stats = users_stats.get("categories", [])
+    state_stats = users_stats.get("byState", [])
+    
+    test_counts = tests_stats.get("counts") or [{}]
+    total_tests = test_counts[0].get("total", 0)
+    test_type_stats = tests_stats.get("byTestType", [])
+    rating_stats = tests_stats.get("ratings", [])
+    
+    return {
+        "totalCandidates": total_candidates,
+        "totalTests": total_tests,
+        "verification": {
+            "verified": verified_count,
+            "flagged": flagged_count,
+            "pending": pending_count,
+            "verifiedRate": round(verified_count / total_candidates * 100, 1) if total_candidates > 0 else 0,
+            "flaggedRate": round(flagged_count / total_candidates * 100, 1) if total_candidates > 0 else 0
+        },
+        "categoryAverages": category_stats[0] if category_stats else {},
+        "candidatesByState": [{"state": s["_id"], "count": s["count"], "avgXP": round(s["avgXP"] or 0, 1)} for s in state_stats],
+        "testTypeDistribution": [{"testType": t["_id"], "count": t["count"], "avgScore": round(t["avgScore"] or 0, 1)} for t in test_type_stats],
+        "performanceRatings": {r["_id"]: r["count"] for r in rating_stats if r["_id"]},
+        "recentCandidates": [serialize_doc(u) for u in recent_users]
+    }
+
+# ============ BACKGROUND SYNC ============
+
+# Delta jobs: each registered handler tails one collection in (field, _id) order
+# from its own watermark and applies the new documents to a derived collection
+INGEST_ENABLED = os.environ.get("INGEST_ENABLED", "true").lower() == "true"
+INGEST_INTERVAL_SECONDS = float(os.environ.get("INGEST_INTERVAL_SECONDS", "15"))
+INGEST_BATCH_SIZE = int(os.environ.get("INGEST_BATCH_SIZE", "1000"))
+INGEST_LEASE_SECONDS = float(os.environ.get("INGEST_LEASE_SECONDS", "300"))
+
+WORKER_ID = str(uuid.uuid4())
+ingest_lock = asyncio.Lock()
+ingest_handlers: List[Dict[str, Any]] = []
+
+def ingest_handler(name: str, collection: str, field: str = "createdAt"):
+    """Register a coroutine that receives batches of new documents from collection"""
+    def register(fn: Callable[[List[dict]], Awaitable[None]]):
+        ingest_handlers.append({"name": name, "collection": collection, "field": field, "fn": fn})
+        return fn
+    return register
+
+def as_utc(value: datetime) -> datetime:
+    """Treat naive datetimes returned by Motor as UTC"""
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+def after_watermark(field: str, watermark: Optional[dict]) -> Dict[str, Any]:
+    """Filter for documents strictly after a (field, _id) watermark"""
+    if not watermark:
+        return {field: {"$ne": None}}
+    return {"$or": [
+        {field: {"$gt": watermark["value"]}},
+        {field: watermark["value"], "_id": {"$gt": watermark["id"]}}
+    ]}
+
+def until_watermark(field: str, watermark: Optional[dict]) -> Dict[str, Any]:
+    """Filter for documents at or before a (field, _id) watermark, plus undated ones"""
+    if not watermark:
+        return {}
+    return {"$or": [
+        {field: {"$lt": watermark["value"]}},
+        {field: watermark["value"], "_id": {"$lte": watermark["id"]}},
+        {field: None}
+    ]}
+
+async def latest_watermark(collection, field: str) -> Optional[dict]:
+    """Watermark of the newest document in collection"""
+    docs = await collection.find({field: {"$ne": None}}, {field: 1}).sort([(field, -1), ("_id", -1)]).limit(1).to_list(1)
+    return {"value": docs[0][field], "id": docs[0]["_id"]} if docs else None
+
+async def get_watermark(name: str) -> Optional[dict]:
+    state = await db.sync_state.find_one({"_id": f"ingest:{name}"})
+    return state.get("watermark") if state else None
+
+async def set_watermark(name: str, watermark: Optional[dict]):
+    await db.sync_state.update_one(
+        {"_id": f"ingest:{name}"},
+        {"$set": {"watermark": watermark, "updatedAt": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+
+async def acquire_lease(name: str, ttl_seconds: float) -> bool:
+    """Take (or renew) a cross-worker lease stored in sync_state"""
+    now = datetime.now(timezone.utc)
+    try:
+        await db.sync_state.update_one(
+            {"_id": f"lease:{name}", "$or": [{"owner": WORKER_ID}, {"expiresAt": {"$lt": now}}]},
+            {"$set": {"owner": WORKER_ID, "expiresAt": now + timedelta(seconds=ttl_seconds)}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        return False
+
+async def release_lease(name: str):
+    await db.sync_state.delete_one({"_id": f"lease:{name}", "owner": WORKER_ID})
+
+@asynccontextmanager
+async def ingest_lease(wait_seconds: float = 0):
+    """Hold the ingest lease so only one process mutates derived collections"""
+    async with ingest_lock:
+        deadline = time.monotonic() + wait_seconds
+        while not await acquire_lease("ingest", INGEST_LEASE_SECONDS):
+            if time.monotonic() >= deadline:
+                yield False
+                return
+            await asyncio.sleep(1)
+        try:
+            yield True
+        finally:
+            await release_lease("ingest")
+
+async def run_ingest_handler(handler: Dict[str, Any]) -> int:
+    """Feed every document past the handler's watermark through it"""
+    collection = db[handler["collection"]]
+    field = handler["field"]
+    watermark = await get_watermark(handler["name"])
+    processed = 0
+    while True:
+        docs = await collection.find(after_watermark(field, watermark)).sort(
+            [(field, 1), ("_id", 1)]
+        ).limit(INGEST_BATCH_SIZE).to_list(INGEST_BATCH_SIZE)
+        if not docs:
+            break
+        await handler["fn"](docs)
+        watermark = {"value": docs[-1][field], "id": docs[-1]["_id"]}
+        await set_watermark(handler["name"], watermark)
+        processed += len(docs)
+        if len(docs) < INGEST_BATCH_SIZE:
+            break
+    return processed
+
+async def run_ingest_cycle():
+    """Run every ingest handler once; assumes the ingest lease is held"""
+    changed = set()
+    for handler in ingest_handlers:
+        try:
+            processed = await run_ingest_handler(handler)
+            if processed:
+                changed.add(handler["collection"])
+                logger.info(f"Ingest {handler['name']}: applied {processed} documents")
+        except Exception as e:
+            logger.error(f"Ingest {handler['name']} error: {e}")
+    try:
+        backfilled = await backfill_search_keys(SEARCH_BACKFILL_BATCHES)
+        if backfilled:
+            changed.add("users")
+            logger.info(f"Ingest search_keys backfill: indexed {backfilled} users")
+    except Exception as e:
+        logger.error(f"Search keys backfill error: {e}")
+    await bump_cache_versions(*sorted(changed))
+    await refresh_dashboard_snapshot_if_due()
+    await reconcile_filter_catalog_if_due()
+
+async def ingest_loop():
+    while True:
+        try:
+            async with ingest_lease() as acquired:
+                if acquired:
+                    await run_ingest_cycle()
+        except Exception as e:
+            logger.error(f"Ingest loop error: {e}")
+        await asyncio.sleep(INGEST_INTERVAL_SECONDS)
+
+# ============ DASHBOARD SNAPSHOT ============
+
+# Running sums, counts and histograms behind /admin/dashboard, kept in a single
+# document so the endpoint is one _id read instead of two collection scans
+DASHBOARD_SNAPSHOT_ID = "dashboard"
+SNAPSHOT_STALE_SECONDS = float(os.environ.get("SNAPSHOT_STALE_SECONDS", "120"))
+SNAPSHOT_REBUILD_SECONDS = float(os.environ.get("SNAPSHOT_REBUILD_SECONDS", "3600"))
+SNAPSHOT_CATEGORIES = ["strength", "endurance", "flexibility", "agility", "speed"]
+# Deltas are keyed on createdAt, so these only see edits to existing users (XP,
+# category scores, state) at the next full rebuild; their staleness follows rebuiltAt
+SNAPSHOT_REBUILD_ONLY_FIELDS = ["categoryAverages", "candidatesByState"]
+
+SNAPSHOT_USERS_PIPELINE = [
+    {"$facet": {
+        "counts": [{"$group": {"_id": None, "total": {"$sum": 1}}}],
+        "verification": [{"$group": {"_id": "$verification.status", "count": {"$sum": 1}}}],
+        "categories": [{"$group": dict(
+            {"_id": None},
+            **{f"{c}Sum": {"$sum": f"$categoryScores.{c}"} for c in SNAPSHOT_CATEGORIES},
+            **{f"{c}N": {"$sum": {"$cond": [{"$isNumber": f"$categoryScores.{c}"}, 1, 0]}} for c in SNAPSHOT_CATEGORIES}
+        )}],
+        "states": [{"$group": {
+            "_id": "$state",
+            "count": {"$sum": 1},
+            "xpSum": {"$sum": "$currentXP"},
+            "xpN": {"$sum": {"$cond": [{"$isNumber": "$currentXP"}, 1, 0]}}
+        }}]
+    }}
+]
+
+SNAPSHOT_TESTS_PIPELINE = [
+    {"$facet": {
+        "counts": [{"$group": {"_id": None, "total": {"$sum": 1}}}],
+        "testTypes": [{"$group": {
+            "_id": "$testType",
+            "count": {"$sum": 1},
+            "scoreSum": {"$sum": "$comparisonScore"},
+            "scoreN": {"$sum": {"$cond": [{"$isNumber": "$comparisonScore"}, 1, 0]}}
+        }}],
+        "ratings": [{"$group": {"_id": "$performanceRating", "count": {"$sum": 1}}}]
+    }}
+]
+
+def snapshot_key(value: Any) -> str:
+    """Encode a grouped value as a safe document key"""
+    if value is None:
+        return "__none__"
+    key = str(value).replace(".", "．").replace("$", "＄")
+    return key or "__empty__"
+
+def is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def snapshot_buckets(groups: List[dict], *fields: str) -> Dict[str, dict]:
+    """Turn $group output into {key: {value, field...}} histogram buckets"""
+    return {
+        snapshot_key(g["_id"]): dict({"value": g["_id"]}, **{f: g.get(f, 0) for f in fields})
+        for g in groups
+    }
+
+async def _rebuild_dashboard_snapshot() -> Dict[str, Any]:
+    """Recompute the snapshot from raw collections; assumes the ingest lease is held"""
+    users_wm, tests_wm = await fan_out(
+        lambda: latest_watermark(db.users, "createdAt"),
+        lambda: latest_watermark(db.testresults, "createdAt")
+    )
+    users_match = [{"$match": until_watermark("createdAt", users_wm)}] if users_wm else []
+    tests_match = [{"$match": until_watermark("createdAt", tests_wm)}] if tests_wm else []
+    users_facet, tests_facet, recent_users = await fan_out(
+        lambda: db.users.aggregate(users_match + SNAPSHOT_USERS_PIPELINE).to_list(1),
+        lambda: db.testresults.aggregate(tests_match + SNAPSHOT_TESTS_PIPELINE).to_list(1),
+        lambda: db.users.find(until_watermark("createdAt", users_wm)).sort("createdAt", -1).limit(5).to_list(5)
+    )
+    users_stats = users_facet[0] if users_facet else {}
+    tests_stats = tests_facet[0] if tests_facet else {}
+    user_counts = users_stats.get("counts") or [{}]
+    test_counts = tests_stats.get("counts") or [{}]
+    categories = (users_stats.get("categories") or [{}])[0]
+    
+    now = datetime.now(timezone.utc)
+    snapshot = {
+        "_id": DASHBOARD_SNAPSHOT_ID,
+        "users": {
+            "total": user_counts[0].get("total", 0),
+            "verification": snapshot_buckets(users_stats.get("verification", []), "count"),
+            "categories": {c: {"sum": categories.get(f"{c}Sum", 0), "n": categories.get(f"{c}N", 0)} for c in SNAPSHOT_CATEGORIES},
+            "states": snapshot_buckets(users_stats.get("states", []), "count", "xpSum", "xpN")
+        },
+        "testresults": {
+            "total": test_counts[0].get("total", 0),
+            "testTypes": snapshot_buckets(tests_stats.get("testTypes", []), "count", "scoreSum", "scoreN"),
+            "ratings": snapshot_buckets(tests_stats.get("ratings", []), "count")
+        },
+        "recentCandidates": recent_users,
+        "rebuiltAt": now,
+        "updatedAt": now,
+        "syncedAt": now
+    }
+    await db.dashboard_snapshot.replace_one({"_id": DASHBOARD_SNAPSHOT_ID}, snapshot, upsert=True)
+    await fan_out(
+        lambda: set_watermark("dashboard_snapshot:users", users_wm),
+        lambda: set_watermark("dashboard_snapshot:testresults", tests_wm)
+    )
+    logger.info(f"Dashboard snapshot rebuilt: {snapshot['users']['total']} users, {snapshot['testresults']['total']} tests")
+    return {"users": snapshot["users"]["total"], "testresults": snapshot["testresults"]["total"], "rebuiltAt": now.isoformat()}
+
+async def rebuild_dashboard_snapshot(wait_seconds: float = 120) -> Dict[str, Any]:
+    """Full rebuild of the dashboard snapshot under the ingest lease"""
+    async with ingest_lease(wait_seconds) as acquired:
+        if not acquired:
+            raise RuntimeError("Ingest lease is held by another worker")
+        return await _rebuild_dashboard_snapshot()
+
+async def refresh_dashboard_snapshot_if_due():
+    """Mark the snapshot as synced, rebuilding it when the periodic reconcile is due"""
+    snapshot = await db.dashboard_snapshot.find_one({"_id": DASHBOARD_SNAPSHOT_ID}, {"rebuiltAt": 1})
+    now = datetime.now(timezone.utc)
+    if not snapshot or (now - as_utc(snapshot["rebuiltAt"])).total_seconds() >= SNAPSHOT_REBUILD_SECONDS:
+        await _rebuild_dashboard_snapshot()
+    else:
+        await db.dashboard_snapshot.update_one({"_id": DASHBOARD_SNAPSHOT_ID}, {"$set": {"syncedAt": now}})
+
+def add_bucket(inc: Dict[str, Any], sets: Dict[str, Any], path: str, value: Any, **increments):
+    """Accumulate $inc/$set operations for one histogram bucket"""
+    key = f"{path}.{snapshot_key(value)}"
+    sets[f"{key}.value"] = value
+    for field, amount in increments.items():
+        inc[f"{key}.{field}"] = inc.get(f"{key}.{field}", 0) + amount
+
+async def apply_snapshot_delta(inc: Dict[str, Any], sets: Dict[str, Any], push: Dict[str, Any] = None):
+    """Apply increments to an existing snapshot; no-op until the first rebuild"""
+    sets["updatedAt"] = datetime.now(timezone.utc)
+    update = {"$inc": inc, "$set": sets}
+    if push:
+        update["$push"] = push
+    await db.dashboard_snapshot.update_one({"_id": DASHBOARD_SNAPSHOT_ID}, update)
+
+@ingest_handler("dashboard_snapshot:users", "users")
+async def apply_new_users_to_snapshot(users: List[dict]):
+    inc, sets = {"users.total": len(users)}, {}
+    for user in users:
+        add_bucket(inc, sets, "users.verification", (user.get("verification") or {}).get("status"), count=1)
+        xp = user.get("currentXP")
+        add_bucket(inc, sets, "users.states", user.get("state"), count=1, xpSum=xp if is_number(xp) else 0, xpN=1 if is_number(xp) else 0)
+        scores = user.get("categoryScores") or {}
+        for category in SNAPSHOT_CATEGORIES:
+            score = scores.get(category)
+            if is_number(score):
+                inc[f"users.categories.{category}.sum"] = inc.get(f"users.categories.{category}.sum", 0) + score
+                inc[f"users.categories.{category}.n"] = inc.get(f"users.categories.{category}.n", 0) + 1
+    push = {"recentCandidates": {"$each": users, "$sort": {"createdAt": -1}, "$slice": 5}}
+    await apply_snapshot_delta(inc, sets, push)
+
+@ingest_handler("dashboard_snapshot:testresults", "testresults")
+async def apply_new_tests_to_snapshot(tests: List[dict]):
+    inc, sets = {"testresults.total": len(tests)}, {}
+    for test in tests:
+        score = test.get("comparisonScore")
+        add_bucket(inc, sets, "testresults.testTypes", test.get("testType"), count=1, scoreSum=score if is_number(score) else 0, scoreN=1 if is_number(score) else 0)
+        add_bucket(inc, sets, "testresults.ratings", test.get("performanceRating"), count=1)
+    await apply_snapshot_delta(inc, sets)
+
+async def apply_verification_to_snapshot(before_status: Optional[str], after_status: Optional[str]):
+    """Move one candidate between verification buckets"""
+    await apply_verification_changes_to_snapshot([(before_status, after_status)])
+
+async def apply_verification_changes_to_snapshot(changes: List[Tuple[Optional[str], Optional[str]]]):
+    """Move candidates between verification buckets in one snapshot update"""
+    inc, sets = {}, {}
+    for before_status, after_status in changes:
+        if before_status != after_status:
+            add_bucket(inc, sets, "users.verification", before_status, count=-1)
+            add_bucket(inc, sets, "users.verification", after_status, count=1)
+    if inc:
+        await apply_snapshot_delta(inc, sets)
+
+def dashboard_from_snapshot(snapshot: dict) -> Dict[str, Any]:
+    """Shape a snapshot document like the live dashboard response"""
+    users = snapshot.get("users", {})
+    tests = snapshot.get("testresults", {})
+    total_candidates = users.get("total", 0)
+    verification = {b["value"]: b["count"] for b in users.get("verification", {}).values()}
+    verified_count = verification.get("verified", 0)
+    flagged_count = verification.get("flagged", 0)
+    
+    category_averages = {}
+    if total_candidates > 0:
+        category_averages["_id"] = None
+        for category in SNAPSHOT_CATEGORIES:
+            bucket = users.get("categories", {}).get(category, {})
+            category_averages[f"avg{category.capitalize()}"] = bucket["sum"] / bucket["n"] if bucket.get("n") else None
+    
+    states = sorted((b for b in users.get("states", {}).values() if b.get("count", 0) > 0), key=lambda b: b["count"], reverse=True)[:10]
+    test_types = sorted((b for b in tests.get("testTypes", {}).values() if b.get("count", 0) > 0), key=lambda b: b["count"], reverse=True)[:20]
+    
+    return {
+        "totalCandidates": total_candidates,
+        "totalTests": tests.get("total", 0),
+        "verification": {
+            "verified": verified_count,
+            "flagged": flagged_count,
+            "pending": total_candidates - verified_count - flagged_count,
+            "verifiedRate": round(verified_count / total_candidates * 100, 1) if total_candidates > 0 else 0,
+            "flaggedRate": round(flagged_count / total_candidates * 100, 1) if total_candidates > 0 else 0
+        },
+        "categoryAverages": category_averages,
+        "candidatesByState": [{"state": b["value"], "count": b["count"], "avgXP": round(b["xpSum"] / b["xpN"] if b.get("xpN") else 0, 1)} for b in states],
+        "testTypeDistribution": [{"testType": b["value"], "count": b["count"], "avgScore": round(b["scoreSum"] / b["scoreN"] if b.get("scoreN") else 0, 1)} for b in test_types],
+        "performanceRatings": {b["value"]: b["count"] for b in tests.get("ratings", {}).values() if b["value"] and b.get("count", 0) > 0},
+        "recentCandidates": [serialize_doc(u) for u in snapshot.get("recentCandidates", [])]
+    }
+
+def snapshot_status(snapshot: Optional[dict]) -> Dict[str, Any]:
+    """Staleness indicator returned alongside dashboard stats"""
+    if not snapshot:
+        return {"source": "live", "stale": False}
+    now = datetime.now(timezone.utc)
+    rebuilt_at = as_utc(snapshot["rebuiltAt"])
+    synced_at = as_utc(snapshot.get("syncedAt") or rebuilt_at)
+    age = (now - synced_at).total_seconds()
+    rebuilt_age = (now - rebuilt_at).total_seconds()
+    return {
+        "source": "snapshot",
+        "rebuiltAt": rebuilt_at.isoformat(),
+        "updatedAt": as_utc(snapshot.get("updatedAt") or rebuilt_at).isoformat(),
+        "syncedAt": synced_at.isoformat(),
+        "ageSeconds": round(age, 1),
+        "rebuiltAgeSeconds": round(rebuilt_age, 1),
+        "stale": age > SNAPSHOT_STALE_SECONDS,
+        # Aggregates that may miss updates to existing users since rebuiltAt
+        "staleFields": SNAPSHOT_REBUILD_ONLY_FIELDS if rebuilt_age > SNAPSHOT_STALE_SECONDS else []
+    }
+
+# ============ CANDIDATE SEARCH ============
+
+# Users carry a normalised `searchKeys` array (name tokens, email, email local
+# part, Aadhaar digits) so admin search is an index prefix seek, not a regex scan
+SEARCH_PREFIX_MIN_DIGITS = 4
+
+def normalize_search_text(text: Any) -> str:
+    """Lowercase, strip accents and collapse whitespace"""
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.lower().split())
+
+def user_search_keys(user: dict) -> List[str]:
+    """Search keys stored on a user document"""
+    keys = set()
+    name = normalize_search_text(user.get("name") or "")
+    keys.update(name.split())
+    email = normalize_search_text(user.get("email") or "")
+    if email:
+        keys.add(email)
+        keys.add(email.split("@")[0])
+    aadhaar = re.sub(r"\D", "", str(user.get("aadhaarNumber") or ""))
+    if aadhaar:
+        keys.add(aadhaar)
+    return sorted(keys)
+
+def build_search_filter(search: str) -> Dict[str, Any]:
+    """Translate a search box string into an indexed users filter"""
+    raw = search.strip()
+    term = normalize_search_text(raw)
+    digits = re.sub(r"[\s-]", "", raw)
+    if "@" in term:
+        # Exact email first, otherwise an email prefix
+        return {"$or": [{"email": raw}, {"searchKeys": {"$regex": f"^{re.escape(term)}"}}]}
+    if digits.isdigit() and len(digits) >= SEARCH_PREFIX_MIN_DIGITS:
+        if len(digits) == 12:
+            return {"$or": [{"aadhaarNumber": raw}, {"searchKeys": digits}]}
+        return {"searchKeys": {"$regex": f"^{digits}"}}
+    clauses = [{"searchKeys": {"$regex": f"^{re.escape(token)}"}} for token in term.split()]
+    if not clauses:
+        return {}
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+async def refresh_search_keys(users: List[dict]) -> int:
+    """Rewrite searchKeys on users whose keys changed"""
+    ops = []
+    for user in users:
+        keys = user_search_keys(user)
+        if keys != user.get("searchKeys"):
+            ops.append(UpdateOne({"_id": user["_id"]}, {"$set": {"searchKeys": keys}}))
+    if ops:
+        await db.users.bulk_write(ops, ordered=False)
+    return len(ops)
+
+@ingest_handler("search_keys", "users", field="updatedAt")
+async def apply_user_updates_to_search_keys(users: List[dict]):
+    await refresh_search_keys(users)
+
+# Batches of unindexed users each ingest cycle backfills, so users the updatedAt
+# watermark never sees become searchable without running the CLI by hand
+SEARCH_BACKFILL_BATCHES = int(os.environ.get("SEARCH_BACKFILL_BATCHES", "10"))
+
+async def backfill_search_keys(max_batches: Optional[int] = None) -> int:
+    """Populate searchKeys for users that have never been indexed"""
+    updated = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        users = await db.users.find(
+            {"searchKeys": {"$exists": False}},
+            {"name": 1, "email": 1, "aadhaarNumber": 1, "searchKeys": 1}
+        ).limit(INGEST_BATCH_SIZE).to_list(INGEST_BATCH_SIZE)
+        if not users:
+            break
+        updated += await refresh_search_keys(users)
+        batches += 1
+    return updated
+
+# ============ FIELD PROJECTIONS ============
+
+# Server-defined response views per collection. `full` (the default) returns whole
+# documents; any other view, or an explicit `fields` list, becomes a Mongo projection
+RESPONSE_VIEWS = {
+    "users": {
+        "table": ["name", "age", "gender", "state", "city", "currentXP", "testProgress", "verification.status", "createdAt"],
+        "card": [
+            "name", "age", "gender", "state", "city", "email", "phoneNumber", "aadhaarNumber", "height", "weight",
+            "currentXP", "currentLevel", "levelTitle", "currentStreak", "longestStreak", "testsCompleted", "totalTests",
+            "testProgress", "categoryScores", "verification", "createdAt"
+        ]
+    },
+    "testresults": {
+        "table": ["userId", "testName", "testType", "category", "performanceRating", "comparisonScore", "isPersonalBest", "date"],
+        "card": [
+            "userId", "testName", "testType", "category", "performanceRating", "comparisonScore", "isPersonalBest", "date",
+            "gender", "ageGroup", "timeTaken", "speed", "distance", "jumpHeight", "repsCount"
+        ]
+    },
+    "activitylogs": {
+        "table": ["userId", "activityType", "activityDate"],
+        "card": ["userId", "activityType", "activityDate", "metadata"]
+    }
+}
+
+def response_projection(collection: str, view: Optional[str] = None, fields: Union[str, List[str], None] = None, required: Tuple[str, ...] = ()) -> Optional[Dict[str, int]]:
+    """Mongo projection for a view or field list; None means whole documents.
+    
+    `fields` (comma-separated or a list) takes precedence over `view`; `required` names
+    fields the endpoint itself reads and are always included.
+    """
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    names = [name.strip() for name in fields or [] if name and name.strip()]
+    if not names:
+        if view in (None, "", "full"):
+            return None
+        if view not in RESPONSE_VIEWS[collection]:
+            raise HTTPException(status_code=400, detail=f"Unknown view '{view}', expected one of: full, {', '.join(RESPONSE_VIEWS[collection])}")
+        names = list(RESPONSE_VIEWS[collection][view])
+    for name in names:
+        if name.startswith("$") or ".." in name or name.endswith("."):
+            raise HTTPException(status_code=400, detail=f"Invalid field '{name}'")
+    names.extend(required)
+    # A parent path already returns its children; projecting both is a path collision
+    paths = sorted(set(names) - {"id"}, key=len)
+    projection = {}
+    for name in paths:
+        if not any(name == parent or name.startswith(parent + ".") for parent in projection):
+            projection[name] = 1
+    return projection or {"_id": 1}
+
+# ============ FILTER CATALOG ============
+
+# Dimension values with their document counts and numeric ranges behind
+# /admin/filter-options, kept in filter_catalog by $inc upserts from the ingest
+# handlers and reconciled against the raw collections periodically
+FILTER_CATALOG_DIMENSIONS = {
+    "users": ["state", "city", "gender"],
+    "testresults": ["testType", "category", "ageGroup", "performanceRating", "testName"]
+}
+FILTER_CATALOG_RANGES = {
+    "users": ["age"],
+    "testresults": ["comparisonScore"]
+}
+FILTER_CATALOG_RECONCILE_SECONDS = float(os.environ.get("FILTER_CATALOG_RECONCILE_SECONDS", "3600"))
+
+def catalog_value_id(collection: str, dimension: str, value: Any) -> Dict[str, Any]:
+    return {"c": collection, "d": dimension, "v": value}
+
+def catalog_range_id(collection: str, field: str) -> Dict[str, Any]:
+    return {"c": collection, "d": field}
+
+def filter_catalog_pipeline(collection: str) -> List[Dict[str, Any]]:
+    """One $facet with value counts per dimension and numeric min/max per range field"""
+    facets = {
+        dimension: [{"$group": {"_id": f"${dimension}", "count": {"$sum": 1}}}]
+        for dimension in FILTER_CATALOG_DIMENSIONS[collection]
+    }
+    for field in FILTER_CATALOG_RANGES[collection]:
+        number = {"$cond": [{"$isNumber": f"${field}"}, f"${field}", None]}
+        facets[f"range:{field}"] = [{"$group": {"_id": None, "min": {"$min": number}, "max": {"$max": number}}}]
+    return [{"$facet": facets}]
+
+def catalog_value(value: Any) -> bool:
+    """Whether a dimension value is listed: non-empty scalars, as the filter dropdowns show"""
+    return bool(value) and isinstance(value, (str, int, float)) and not isinstance(value, bool)
+
+async def filter_catalog_facets(collection: str) -> tuple:
+    """(watermark, facets) of one collection counted up to its newest document"""
+    watermark = await latest_watermark(db[collection], "createdAt")
+    match = [{"$match": until_watermark("createdAt", watermark)}] if watermark else []
+    facets = await db[collection].aggregate(match + filter_catalog_pipeline(collection), allowDiskUse=True).to_list(1)
+    return watermark, (facets or [{}])[0]
+
+async def _reconcile_filter_catalog() -> Dict[str, Any]:
+    """Recompute filter_catalog from raw collections; assumes the ingest lease is held"""
+    docs, watermarks = [], {}
+    results = await fan_out(*(lambda c=collection: filter_catalog_facets(c) for collection in FILTER_CATALOG_DIMENSIONS))
+    for collection, (watermark, facets) in zip(FILTER_CATALOG_DIMENSIONS, results):
+        for dimension in FILTER_CATALOG_DIMENSIONS[collection]:
+            docs.extend(
+                {"_id": catalog_value_id(collection, dimension, g["_id"]), "count": g["count"]}
+                for g in facets.get(dimension, []) if catalog_value(g["_id"])
+            )
+        for field in FILTER_CATALOG_RANGES[collection]:
+            bounds = (facets.get(f"range:{field}") or [{}])[0]
+            if bounds.get("min") is not None:
+                docs.append({"_id": catalog_range_id(collection, field), "min": bounds["min"], "max": bounds["max"]})
+        watermarks[collection] = watermark
+    
+    staging = "filter_catalog_reconcile"
+    await db[staging].drop()
+    if docs:
+        await db[staging].insert_many(docs, ordered=False)
+        await db[staging].rename("filter_catalog", dropTarget=True)
+    else:
+        await db.filter_catalog.drop()
+    for collection, watermark in watermarks.items():
+        await set_watermark(f"filter_catalog:{collection}", watermark)
+    
+    now = datetime.now(timezone.utc)
+    await db.sync_state.update_one({"_id": "filter_catalog"}, {"$set": {"reconciledAt": now}}, upsert=True)
+    logger.info(f"Filter catalog reconciled: {len(docs)} entries")
+    return {"entries": len(docs), "reconciledAt": now.isoformat()}
+
+async def reconcile_filter_catalog(wait_seconds: float = 120) -> Dict[str, Any]:
+    """Full reconciliation of the filter catalog under the ingest lease"""
+    async with ingest_lease(wait_seconds) as acquired:
+        if not acquired:
+            raise RuntimeError("Ingest lease is held by another worker")
+        return await _reconcile_filter_catalog()
+
+async def reconcile_filter_catalog_if_due():
+    state = await db.sync_state.find_one({"_id": "filter_catalog"}, {"reconciledAt": 1})
+    now = datetime.now(timezone.utc)
+    if not state or (now - as_utc(state["reconciledAt"])).total_seconds() >= FILTER_CATALOG_RECONCILE_SECONDS:
+        await _reconcile_filter_catalog()
+
+async def apply_catalog_delta(collection: str, docs: List[dict]):
+    """$inc value counts and widen ranges for new documents; no-op until the first reconcile"""
+    if not await db.sync_state.find_one({"_id": "filter_catalog"}, {"_id": 1}):
+        return
+    counts: Dict[tuple, int] = {}
+    ranges: Dict[str, List[float]] = {}
+    for doc in docs:
+        for dimension in FILTER_CATALOG_DIMENSIONS[collection]:
+            value = doc.get(dimension)
+            if catalog_value(value):
+                counts[(dimension, value)] = counts.get((dimension, value), 0) + 1
+        for field in FILTER_CATALOG_RANGES[collection]:
+            value = doc.get(field)
+            if is_number(value):
+                ranges.setdefault(field, []).append(value)
+    ops = [
+        UpdateOne({"_id": catalog_value_id(collection, dimension, value)}, {"$inc": {"count": n}}, upsert=True)
+        for (dimension, value), n in counts.items()
+    ]
+    ops.extend(
+        UpdateOne({"_id": catalog_range_id(collection, field)}, {"$min": {"min": min(values)}, "$max": {"max": max(values)}}, upsert=True)
+        for field, values in ranges.items()
+    )
+    if ops:
+        await db.filter_catalog.bulk_write(ops, ordered=False)
+
+@ingest_handler("filter_catalog:users", "users")
+async def apply_new_users_to_catalog(users: List[dict]):
+    await apply_catalog_delta("users", users)
+
+@ingest_handler("filter_catalog:testresults", "testresults")
+async def apply_new_tests_to_catalog(tests: List[dict]):
+    await apply_catalog_delta("testresults", tests)
+
+def filter_options_from_catalog(entries: List[dict]) -> Dict[str, Any]:
+    """Shape filter_catalog documents like the /admin/filter-options response"""
+    values: Dict[tuple, List[Any]] = {}
+    ranges: Dict[tuple, dict] = {}
+    for entry in entries:
+        key = (entry["_id"]["c"], entry["_id"]["d"])
+        if "v" in entry["_id"]:
+            if entry.get("count", 0) > 0:
+                values.setdefault(key, []).append(entry["_id"]["v"])
+        else:
+            ranges[key] = entry
+    age = ranges.get(("users", "age"))
+    score = ranges.get(("testresults", "comparisonScore"))
+    return {
+        "states": sorted(values.get(("users", "state"), [])),
+        "cities": sorted(values.get(("users", "city"), [])),
+        "genders": sorted(values.get(("users", "gender"), [])),
+        "testTypes": sorted(values.get(("testresults", "testType"), [])),
+        "testNames": sorted(values.get(("testresults", "testName"), [])),
+        "categories": sorted(values.get(("testresults", "category"), [])),
+        "ageGroups": sorted(values.get(("testresults", "ageGroup"), [])),
+        "performanceRatings": sorted(values.get(("testresults", "performanceRating"), [])),
+        "ageRange": {"_id": None, "minAge": age["min"], "maxAge": age["max"]} if age else {"minAge": 10, "maxAge": 40},
+        "scoreRange": {"_id": None, "minScore": score["min"], "maxScore": score["max"]} if score else {"minScore": 0, "maxScore": 100}
+    }
+
+# ============ EXPORT ============
+
+# Exports are produced as a stream of encoded chunks read from the cursor in
+# fixed-size batches, so memory stays flat whatever the row count
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", "1000"))
+
+EXPORT_FORMATS = {
+    "json": {"mediaType": "application/json", "extension": "json", "compressed": False},
+    "csv": {"mediaType": "text/csv", "extension": "csv", "compressed": False},
+    "ndjson": {"mediaType": "application/x-ndjson", "extension": "ndjson", "compressed": False},
+    "parquet": {"mediaType": "application/vnd.apache.parquet", "extension": "parquet", "compressed": True},
+    "arrow": {"mediaType": "application/vnd.apache.arrow.stream", "extension": "arrows", "compressed": False}
+}
+COLUMNAR_EXPORT_FORMATS = {"parquet", "arrow"}
+
+# Typed column layout for columnar exports: (column, document path, kind)
+EXPORT_COLUMNS = {
+    "candidates": [
+        ("id", "_id", "string"),
+        ("name", "name", "string"),
+        ("email", "email", "string"),
+        ("aadhaarNumber", "aadhaarNumber", "string"),
+        ("age", "age", "int"),
+        ("gender", "gender", "string"),
+        ("state", "state", "string"),
+        ("city", "city", "string"),
+        ("currentXP", "currentXP", "int"),
+        ("categoryScores_strength", "categoryScores.strength", "float"),
+        ("categoryScores_endurance", "categoryScores.endurance", "float"),
+        ("categoryScores_flexibility", "categoryScores.flexibility", "float"),
+        ("categoryScores_agility", "categoryScores.agility", "float"),
+        ("categoryScores_speed", "categoryScores.speed", "float"),
+        ("verification_status", "verification.status", "string"),
+        ("verification_adminId", "verification.adminId", "string"),
+        ("verification_note", "verification.note", "string"),
+        ("verification_updatedAt", "verification.updatedAt", "timestamp"),
+        ("createdAt", "createdAt", "timestamp"),
+        ("updatedAt", "updatedAt", "timestamp")
+    ],
+    "test-results": [
+        ("id", "_id", "string"),
+        ("userId", "userId", "string"),
+        ("testName", "testName", "string"),
+        ("testType", "testType", "string"),
+        ("category", "category", "string"),
+        ("performanceRating", "performanceRating", "string"),
+        ("gender", "gender", "string"),
+        ("ageGroup", "ageGroup", "string"),
+        ("comparisonScore", "comparisonScore", "float"),
+        ("timeTaken", "timeTaken", "float"),
+        ("speed", "speed", "float"),
+        ("distance", "distance", "float"),
+        ("jumpHeight", "jumpHeight", "float"),
+        ("repsCount", "repsCount", "int"),
+        ("date", "date", "timestamp"),
+        ("createdAt", "createdAt", "timestamp")
+    ]
+}
+
+def build_export_query(type: str, state: Optional[str] = None, gender: Optional[str] = None,
+                       verificationStatus: Optional[str] = None, testType: Optional[str] = None) -> tuple:
+    """Collection and filter for an export request"""
+    filter_query = {}
+    if type == "candidates":
+        collection = db.users
+        if state:
+            filter_query["state"] = state
+        if gender:
+            filter_query["gender"] = gender
+        if verificationStatus:
+            filter_query["verification.status"] = verificationStatus
+    else:
+        collection = db.testresults
+        if testType:
+            filter_query["testType"] = testType
+        if gender:
+            filter_query["gender"] = gender
+    return collection, filter_query
+
+async def iter_export_batches(collection, filter_query: Dict[str, Any], limit: Optional[int], stats: Dict[str, int], serialize: bool = True):
+    """Yield documents in batches, counting rows into stats"""
+    cursor = collection.find(filter_query, batch_size=EXPORT_BATCH_SIZE)
+    if limit:
+        cursor = cursor.limit(limit)
+    batch = []
+    async for doc in cursor:
+        batch.append(serialize_doc(doc) if serialize else doc)
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            stats["rows"] += len(batch)
+            yield batch
+            batch = []
+    if batch:
+        stats["rows"] += len(batch)
+        yield batch
+
+def flatten_export_row(item: dict) -> dict:
+    """Flatten nested objects for CSV"""
+    flat_item = {}
+    for key, value in item.items():
+        if isinstance(value, dict):
+            for k, v in value.items():
+                flat_item[f"{key}_{k}"] = v
+        elif isinstance(value, list):
+            flat_item[key] = str(value)[:200]  # Truncate arrays
+        else:
+            flat_item[key] = value
+    return flat_item
+
+def json_default(value: Any) -> Any:
+    """json.dumps fallback for BSON values left inside lists"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+async def export_csv_chunks(batches):
+    """Encode batches as CSV; headers are sampled from the first batch"""
+    headers = None
+    async for batch in batches:
+        flat_data = [flatten_export_row(item) for item in batch]
+        output = io.StringIO()
+        if headers is None:
+            headers = sorted({key for item in flat_data for key in item})
+            writer = csv.DictWriter(output, fieldnames=headers, extrasaction='ignore')
+            writer.writeheader()
+        else:
+            writer = csv.DictWriter(output, fieldnames=headers, extrasaction='ignore')
+        writer.writerows(flat_data)
+        yield output.getvalue().encode()
+    if headers is None:
+        yield b"No data"
+
+async def export_json_chunks(batches, type: str):
+    """Encode batches as the JSON export envelope, one record at a time"""
+    yield json.dumps({"type": type, "exportedAt": datetime.now(timezone.utc).isoformat()})[:-1].encode() + b', "data": ['
+    count = 0
+    async for batch in batches:
+        parts = []
+        for item in batch:
+            parts.append(("," if count else "") + json.dumps(item, default=json_default))
+            count += 1
+        yield "".join(parts).encode()
+    yield f'], "count": {count}}}'.encode()
+
+async def export_ndjson_chunks(batches):
+    """Encode batches as newline-delimited JSON"""
+    async for batch in batches:
+        yield "".join(json.dumps(item, default=json_default) + "\n" for item in batch).encode()
+
+def coerce_export_value(value: Any, kind: str) -> Any:
+    """Coerce a raw document value to its column type, None when it does not fit"""
+    if value is None:
+        return None
+    try:
+        if kind == "string":
+            return str(value)
+        if kind == "int":
+            return int(value)
+        if kind == "float":
+            return float(value)
+        if kind == "timestamp":
+            if isinstance(value, str):
+                value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+            return as_utc(value) if isinstance(value, datetime) else None
+    except (TypeError, ValueError, OverflowError):
+        return None
+    return value
+
+def export_arrow_schema(type: str):
+    kinds = {"string": pa.string(), "int": pa.int64(), "float": pa.float64(), "timestamp": pa.timestamp("ms", tz="UTC")}
+    return pa.schema([(column, kinds[kind]) for column, _, kind in EXPORT_COLUMNS[type]])
+
+def export_record_batch(docs: List[dict], type: str, schema):
+    """Build one typed RecordBatch from raw documents"""
+    arrays = [
+        pa.array([coerce_export_value(get_path(doc, path), kind) for doc in docs], type=schema.field(column).type)
+        for column, path, kind in EXPORT_COLUMNS[type]
+    ]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+class ChunkSink:
+    """Write-only file object whose bytes are drained into the response stream"""
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+    
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+    
+    def writable(self) -> bool:
+        return True
+    
+    def tell(self) -> int:
+        return self.position
+    
+    def flush(self):
+        pass
+    
+    def close(self):
+        self.closed = True
+    
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+async def export_columnar_chunks(batches, type: str, format: str):
+    """Encode raw document batches as Parquet row groups or Arrow IPC record batches"""
+    schema = export_arrow_schema(type)
+    sink = ChunkSink()
+    stream = pa.PythonFile(sink, mode="w")
+    writer = pq.ParquetWriter(stream, schema, compression="snappy") if format == "parquet" else pa.ipc.new_stream(stream, schema)
+    try:
+        async for batch in batches:
+            record_batch = export_record_batch(batch, type, schema)
+            await asyncio.to_thread(writer.write_batch, record_batch)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+def export_chunks(format: str, type: str, collection, filter_query: Dict[str, Any], limit: Optional[int], stats: Dict[str, int]):
+    """Encoded chunk stream for an export in the requested format"""
+    if format in COLUMNAR_EXPORT_FORMATS:
+        if pa is None:
+            raise HTTPException(status_code=501, detail="Parquet and Arrow exports require pyarrow")
+        return export_columnar_chunks(iter_export_batches(collection, filter_query, limit, stats, serialize=False), type, format)
+    batches = iter_export_batches(collection, filter_query, limit, stats)
+    if format == "csv":
+        return export_csv_chunks(batches)
+    if format == "ndjson":
+        return export_ndjson_chunks(batches)
+    return export_json_chunks(batches, type)
+
+async def gzip_chunks(chunks):
+    """Gzip-compress a chunk stream on the fly"""
+    compressor = zlib.compressobj(wbits=31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+async def audit_export(chunks, stats: Dict[str, int], type: str, format: str, admin_id: str = "SAI_ADMIN_001"):
+    """Pass chunks through and audit the final row count once streaming ends"""
+    completed = False
+    try:
+        async for chunk in chunks:
+            yield chunk
+        completed = True
+    finally:
+        try:
+            await log_audit(
+                admin_id=admin_id,
+                action="export",
+                target_id="bulk",
+                target_type=type,
+                note=f"Exported {stats['rows']} {type} records as {format}" + ("" if completed else " (interrupted)")
+            )
+        except Exception as e:
+            logger.error(f"Export audit error: {e}")
+
+# ============ EXPORT JOBS ============
+
+# Large exports run as background tasks that spool a compressed file to local disk;
+# job state lives in export_jobs so any worker can report progress. Each worker
+# heartbeats its own jobs; a periodic sweep deletes files past their retention and
+# fails jobs whose worker stopped heartbeating (crash or restart).
+EXPORT_DIR = Path(os.environ.get("EXPORT_DIR", str(ROOT_DIR / "exports")))
+EXPORT_JOB_CONCURRENCY = int(os.environ.get("EXPORT_JOB_CONCURRENCY", "2"))
+EXPORT_RETENTION_SECONDS = float(os.environ.get("EXPORT_RETENTION_SECONDS", "86400"))
+EXPORT_HEARTBEAT_SECONDS = float(os.environ.get("EXPORT_HEARTBEAT_SECONDS", "30"))
+EXPORT_ORPHAN_SECONDS = float(os.environ.get("EXPORT_ORPHAN_SECONDS", "120"))
+EXPORT_SWEEP_SECONDS = float(os.environ.get("EXPORT_SWEEP_SECONDS", "300"))
+EXPORT_PROGRESS_INTERVAL_SECONDS = 1.0
+EXPORT_DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+export_job_slots = asyncio.Semaphore(EXPORT_JOB_CONCURRENCY)
+export_job_tasks = set()
+
+def start_export_job(job_id: str):
+    task = asyncio.create_task(run_export_job(job_id), name=job_id)
+    export_job_tasks.add(task)
+    task.add_done_callback(export_job_tasks.discard)
+
+async def run_export_job(job_id: str):
+    """Write an export job's file, recording progress as it goes"""
+    job = await db.export_jobs.find_one({"_id": job_id})
+    params = job["params"]
+    path = EXPORT_DIR / job["filename"]
+    partial_path = path.with_name(path.name + ".part")
+    stats = {"rows": 0}
+    
+    async with export_job_slots:
+        await db.export_jobs.update_one({"_id": job_id}, {"$set": {"status": "running", "startedAt": datetime.now(timezone.utc)}})
+        try:
+            collection, filter_query = build_export_query(
+                params["type"], params.get("state"), params.get("gender"),
+                params.get("verificationStatus"), params.get("testType")
+            )
+            rows_total = await collection.count_documents(filter_query)
+            if params.get("limit"):
+                rows_total = min(rows_total, params["limit"])
+            await db.export_jobs.update_one({"_id": job_id}, {"$set": {"rowsTotal": rows_total}})
+            
+            chunks = export_chunks(params["format"], params["type"], collection, filter_query, params.get("limit"), stats)
+            chunks = audit_export(chunks, stats, params["type"], params["format"], admin_id=job["adminId"])
+            if not EXPORT_FORMATS[params["format"]]["compressed"]:
+                chunks = gzip_chunks(chunks)
+            
+            EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+            bytes_written = 0
+            last_progress = time.monotonic()
+            with open(partial_path, "wb") as f:
+                async for chunk in chunks:
+                    await asyncio.to_thread(f.write, chunk)
+                    bytes_written += len(chunk)
+                    if time.monotonic() - last_progress >= EXPORT_PROGRESS_INTERVAL_SECONDS:
+                        await db.export_jobs.update_one(
+                            {"_id": job_id},
+                            {"$set": {"rowsWritten": stats["rows"], "bytesWritten": bytes_written}}
+                        )
+                        last_progress = time.monotonic()
+            os.replace(partial_path, path)
+            
+            await db.export_jobs.update_one({"_id": job_id}, {"$set": {
+                "status": "completed",
+                "rowsWritten": stats["rows"],
+                "bytesWritten": bytes_written,
+                "finishedAt": datetime.now(timezone.utc)
+            }})
+            logger.info(f"Export job {job_id} completed: {stats['rows']} rows, {bytes_written} bytes")
+        except BaseException as e:
+            partial_path.unlink(missing_ok=True)
+            error = "Cancelled" if isinstance(e, asyncio.CancelledError) else str(e)
+            logger.error(f"Export job {job_id} failed: {error}")
+            await db.export_jobs.update_one({"_id": job_id}, {"$set": {
+                "status": "failed",
+                "error": error,
+                "rowsWritten": stats["rows"],
+                "finishedAt": datetime.now(timezone.utc)
+            }})
+            if not isinstance(e, Exception):
+                raise
+
+async def heartbeat_export_jobs():
+    """Mark this worker's queued and running export jobs as alive"""
+    job_ids = [task.get_name() for task in export_job_tasks if not task.done()]
+    if job_ids:
+        await db.export_jobs.update_many(
+            {"_id": {"$in": job_ids}, "status": {"$in": ["queued", "running"]}},
+            {"$set": {"heartbeatAt": datetime.now(timezone.utc)}}
+        )
+
+async def sweep_export_jobs() -> Dict[str, int]:
+    """Fail export jobs orphaned by a dead worker and delete files past their retention"""
+    now = datetime.now(timezone.utc)
+    orphan_cutoff = now - timedelta(seconds=EXPORT_ORPHAN_SECONDS)
+    orphan_filter = {
+        "status": {"$in": ["queued", "running"]},
+        "worker": {"$ne": WORKER_ID},
+        "$or": [{"heartbeatAt": {"$lt": orphan_cutoff}}, {"heartbeatAt": None, "createdAt": {"$lt": orphan_cutoff}}]
+    }
+    failed = 0
+    async for job in db.export_jobs.find(orphan_filter, {"filename": 1}):
+        result = await db.export_jobs.update_one({"_id": job["_id"], **orphan_filter}, {"$set": {
+            "status": "failed",
+            "error": "Export worker stopped before the job finished",
+            "finishedAt": now
+        }})
+        if result.modified_count:
+            (EXPORT_DIR / (job["filename"] + ".part")).unlink(missing_ok=True)
+            failed += 1
+    
+    expire_filter = {"status": "completed", "finishedAt": {"$lt": now - timedelta(seconds=EXPORT_RETENTION_SECONDS)}}
+    expired = 0
+    async for job in db.export_jobs.find(expire_filter, {"filename": 1}):
+        # Expire first so downloads answer 410 before the file disappears
+        result = await db.export_jobs.update_one({"_id": job["_id"], **expire_filter}, {"$set": {"status": "expired", "expiredAt": now}})
+        if result.modified_count:
+            (EXPORT_DIR / job["filename"]).unlink(missing_ok=True)
+            expired += 1
+    if failed or expired:
+        logger.info(f"Export sweep: failed {failed} orphaned jobs, expired {expired} files")
+    return {"failed": failed, "expired": expired}
+
+async def export_jobs_loop():
+    """Heartbeat this worker's export jobs; sweep on startup and every EXPORT_SWEEP_SECONDS"""
+    last_sweep = None
+    while True:
+        try:
+            await heartbeat_export_jobs()
+            if last_sweep is None or time.monotonic() - last_sweep >= EXPORT_SWEEP_SECONDS:
+                last_sweep = time.monotonic()
+                await sweep_export_jobs()
+        except Exception as e:
+            logger.error(f"Export jobs loop error: {e}")
+        await asyncio.sleep(EXPORT_HEARTBEAT_SECONDS)
+
+def export_job_filename(type: str, format: str, job_id: str) -> str:
+    export_format = EXPORT_FORMATS[format]
+    filename = f"sai_export_{type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{job_id[:8]}.{export_format['extension']}"
+    return filename if export_format["compressed"] else filename + ".gz"
+
+def export_job_view(job: dict) -> Dict[str, Any]:
+    """Job document with progress, ETA and download link"""
+    rows_written = job.get("rowsWritten", 0)
+    rows_total = job.get("rowsTotal")
+    eta = None
+    if job["status"] == "running" and rows_written and rows_total and job.get("startedAt"):
+        elapsed = (datetime.now(timezone.utc) - as_utc(job["startedAt"])).total_seconds()
+        eta = round(elapsed / rows_written * max(rows_total - rows_written, 0), 1)
+    view = serialize_doc(job)
+    view["progress"] = {
+        "rowsWritten": rows_written,
+        "rowsTotal": rows_total,
+        "bytesWritten": job.get("bytesWritten", 0),
+        "percent": round(rows_written / rows_total * 100, 1) if rows_total else (100.0 if job["status"] == "completed" else 0),
+        "etaSeconds": eta
+    }
+    view["downloadUrl"] = f"/api/admin/export/jobs/{job['_id']}/download" if job["status"] == "completed" else None
+    return view
+
+def parse_byte_range(range_header: str, size: int) -> tuple:
+    """Parse a single `bytes=start-end` range into inclusive offsets"""
+    unsatisfiable = HTTPException(status_code=416, detail="Requested range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", range_header.strip())
+    if not match or match.groups() == ("", ""):
+        raise unsatisfiable
+    start_text, end_text = match.groups()
+    if not start_text:
+        suffix = int(end_text)
+        if suffix == 0:
+            raise unsatisfiable
+        start, end = max(size - suffix, 0), size - 1
+    else:
+        start = int(start_text)
+        end = min(int(end_text), size - 1) if end_text else size - 1
+    if start >= size or start > end:
+        raise unsatisfiable
+    return start, end
+
+async def iter_file_range(path: Path, start: int, end: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await asyncio.to_thread(f.read, min(EXPORT_DOWNLOAD_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+# ============ INDEXES ============
+
+# Indexes matched to the filter/sort shapes the endpoints issue
+# (equality fields first, then the sort key, then ranges)
+INDEX_BOOTSTRAP = os.environ.get("INDEX_BOOTSTRAP", "true").lower() == "true"
+
+INDEX_SPECS = {
+    "users": [
+        [("createdAt", -1), ("_id", -1)],
+        [("updatedAt", 1), ("_id", 1)],
+        [("state", 1), ("createdAt", -1)],
+        [("state", 1), ("city", 1), ("createdAt", -1)],
+        [("city", 1), ("createdAt", -1)],
+        [("gender", 1), ("age", 1)],
+        [("age", 1)],
+        [("currentXP", -1), ("_id", -1)],
+        [("verification.status", 1), ("createdAt", -1)],
+        [("searchKeys", 1)],
+        [("email", 1)],
+        [("aadhaarNumber", 1)]
+    ],
+    "testresults": [
+        [("date", -1), ("_id", -1)],
+        [("createdAt", 1), ("_id", 1)],
+        [("userId", 1), ("date", -1)],
+        [("userId", 1), ("testName", 1)],
+        [("testType", 1), ("date", -1)],
+        [("testName", 1), ("date", -1)],
+        [("performanceRating", 1), ("date", -1)],
+        [("gender", 1), ("ageGroup", 1), ("date", -1)],
+        [("comparisonScore", -1)],
+        [("testName", 1), ("timeTaken", 1)],
+        [("testName", 1), ("speed", -1)],
+        [("testName", 1), ("distance", -1)],
+        [("testName", 1), ("comparisonScore", -1)]
+    ],
+    "admin_audit": [
+        [("timestamp", -1)],
+        [("targetId", 1), ("timestamp", -1)],
+        [("adminId", 1), ("timestamp", -1)]
+    ],
+    "export_jobs": [
+        [("status", 1), ("finishedAt", 1)]
+    ],
+    "activitylogs": [
+        [("userId", 1), ("activityDate", -1)]
+    ],
+    "user_test_summary": [
+        [("metrics.t", 1), ("metrics.m", 1), ("metrics.max", 1)],
+        [("metrics.t", 1), ("metrics.m", 1), ("metrics.min", 1)]
+    ]
+}
+
+# Representative (filter, sort) shapes checked with explain() in the index report
+INDEX_QUERY_SHAPES = {
+    "users": [
+        ({}, [("createdAt", -1), ("_id", -1)]),
+        ({"state": "", "city": ""}, [("createdAt", -1), ("_id", -1)]),
+        ({"gender": "", "age": {"$gte": 0, "$lte": 100}}, [("createdAt", -1), ("_id", -1)]),
+        ({"verification.status": "verified"}, [("createdAt", -1), ("_id", -1)]),
+        ({"currentXP": {"$gte": 0}}, [("currentXP", -1), ("_id", -1)]),
+        ({"searchKeys": {"$regex": "^a"}}, [("createdAt", -1), ("_id", -1)])
+    ],
+    "testresults": [
+        ({}, [("date", -1)]),
+        ({"userId": ObjectId()}, [("date", -1)]),
+        ({"testType": ""}, [("date", -1)]),
+        ({"testName": ""}, [("date", -1)]),
+        ({"performanceRating": ""}, [("date", -1)]),
+        ({"gender": "", "ageGroup": ""}, [("date", -1)]),
+        ({"comparisonScore": {"$gte": 0}}, [("comparisonScore", -1)]),
+        ({"testName": "", "speed": {"$gt": 0}}, [("speed", -1)]),
+        ({"userId": ObjectId(), "testName": ""}, [])
+    ],
+    "admin_audit": [
+        ({"targetId": ""}, [("timestamp", -1)]),
+        ({"adminId": ""}, [("timestamp", -1)]),
+        ({}, [("timestamp", -1)])
+    ]
+}
+
+def index_key(keys) -> tuple:
+    """Comparable form of an index key pattern"""
+    return tuple((field, int(direction) if isinstance(direction, (int, float)) else direction) for field, direction in keys)
+
+async def ensure_indexes() -> Dict[str, List[str]]:
+    """Create any declared index that is missing; safe to run repeatedly"""
+    created = {}
+    for collection, specs in INDEX_SPECS.items():
+        existing = {index_key(info["key"]) for info in (await db[collection].index_information()).values()}
+        missing = [IndexModel(keys) for keys in specs if index_key(keys) not in existing]
+        if missing:
+            created[collection] = await db[collection].create_indexes(missing)
+            logger.info(f"Created indexes on {collection}: {created[collection]}")
+    return created
+
+def plan_stages(plan: dict) -> List[dict]:
+    """Flatten an explain() plan tree into its stages"""
+    stages = [plan]
+    for child_key in ("inputStage", "queryPlan"):
+        if isinstance(plan.get(child_key), dict):
+            stages.extend(plan_stages(plan[child_key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(plan_stages(child))
+    return stages
+
+async def index_report() -> Dict[str, Any]:
+    """Missing/unused indexes and the plans chosen for the endpoint query shapes"""
+    report = {}
+    for collection in INDEX_SPECS:
+        coll = db[collection]
+        query_shapes = INDEX_QUERY_SHAPES.get(collection, [])
+        existing, stats, *explains = await fan_out(
+            lambda: coll.index_information(),
+            lambda: coll.aggregate([{"$indexStats": {}}]).to_list(None),
+            *(lambda f=filter_query, s=sort: coll.find(f).sort(s).limit(1).explain() for filter_query, sort in query_shapes)
+        )
+        existing_keys = {index_key(info["key"]) for info in existing.values()}
+        
+        shapes = []
+        for (filter_query, sort), explain in zip(query_shapes, explains):
+            stages = plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))
+            shapes.append({
+                "filter": list(filter_query.keys()),
+                "sort": [field for field, _ in sort],
+                "indexes": [stage["indexName"] for stage in stages if stage.get("indexName")],
+                "collectionScan": any(stage.get("stage") == "COLLSCAN" for stage in stages),
+                "inMemorySort": any(stage.get("stage") == "SORT" for stage in stages)
+            })
+        
+        report[collection] = {
+            "missing": [[list(k) for k in keys] for keys in INDEX_SPECS[collection] if index_key(keys) not in existing_keys],
+            "unused": [
+                {"name": stat["name"], "since": as_utc(stat["accesses"]["since"]).isoformat()}
+                for stat in stats
+                if stat["name"] != "_id_" and stat["accesses"]["ops"] == 0
+            ],
+            "usage": {stat["name"]: stat["accesses"]["ops"] for stat in stats},
+            "queryShapes": shapes
+        }
+    return report
+
+# ============ TEST FILTERS ============
+
+# testFilter.<TestName>.<metric> clauses are ANDed across clauses: a user matches
+# when, for every clause, some result of that test satisfies the metric condition
+TEST_FILTER_COMPARISONS = {"$gt", "$gte", "$lt", "$lte"}
+
+def test_filter_clause(tf: Dict[str, Any]) -> Dict[str, Any]:
+    """Query form of one test filter"""
+    return {"testName": tf["testName"], tf["metric"]: tf["condition"]}
+
+def condition_expr(field: str, condition: Any) -> Dict[str, Any]:
+    """Aggregation-expression form of a query condition on field"""
+    path = f"${field}"
+    if not isinstance(condition, dict):
+        return {"$eq": [path, {"$literal": condition}]}
+    exprs = []
+    for op, operand in condition.items():
+        literal = {"$literal": operand}
+        if op in TEST_FILTER_COMPARISONS:
+            # Match query semantics: comparisons only hold within the operand's type
+            same_type = {"$isNumber": path} if is_number(operand) else {"$eq": [{"$type": path}, {"$type": literal}]}
+            exprs.append({"$and": [same_type, {op: [path, literal]}]})
+        elif op == "$eq":
+            exprs.append({"$eq": [path, literal]})
+        elif op == "$ne":
+            exprs.append({"$ne": [path, literal]})
+        elif op == "$in":
+            exprs.append({"$in": [path, literal]})
+        elif op == "$nin":
+            exprs.append({"$not": [{"$in": [path, literal]}]})
+        elif op == "$exists":
+            exprs.append({"$ne" if operand else "$eq": [{"$type": path}, "missing"]})
+        else:
+            raise HTTPException(status_code=400, detail=f"Unsupported operator {op} in testFilter.{field}")
+    return {"$and": exprs}
+
+def test_filter_stages(test_filters: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """testresults pipeline yielding the user documents that satisfy every test filter"""
+    clauses = [test_filter_clause(tf) for tf in test_filters]
+    hits = [
+        {"$cond": [
+            {"$and": [{"$eq": ["$testName", {"$literal": tf["testName"]}]}, condition_expr(tf["metric"], tf["condition"])]},
+            i,
+            None
+        ]}
+        for i, tf in enumerate(test_filters)
+    ]
+    return [
+        {"$match": clauses[0] if len(clauses) == 1 else {"$or": clauses}},
+        {"$project": {
+            "_id": 0,
+            "userId": {"$convert": {"input": "$userId", "to": "objectId", "onError": "$userId", "onNull": None}},
+            "hits": {"$setDifference": [hits, [None]]}
+        }},
+        {"$unwind": "$hits"},
+        {"$group": {"_id": "$userId", "hits": {"$addToSet": "$hits"}}},
+        {"$match": {"hits": {"$size": len(test_filters)}}},
+        {"$lookup": {"from": "users", "localField": "_id", "foreignField": "_id", "as": "user"}},
+        {"$unwind": "$user"},
+        {"$replaceRoot": {"newRoot": "$user"}}
+    ]
+
+TEST_METRIC_FIELDS = ["timeTaken", "speed", "distance"]
+
+def parse_test_metric_sort(field: str, test_names: List[str]) -> Optional[tuple]:
+    """(testName, metric) a sort field refers to; flat metrics use the first filtered test"""
+    if field.startswith("testFilter."):
+        parts = field.split(".", 2)
+        return (parts[1], parts[2]) if len(parts) == 3 else None
+    if field in TEST_METRIC_FIELDS and test_names:
+        return test_names[0], field
+    return None
+
+def test_metric_sort_stages(test_name: str, metric: str, direction: int, alias: str) -> List[Dict[str, Any]]:
+    """Project each user's best metric for a test into alias (users without one sort last)"""
+    best = "$max" if direction == -1 else "$min"
+    return [
+        {"$lookup": {
+            "from": "testresults",
+            "let": {"uid": "$_id"},
+            "pipeline": [
+                {"$match": {"testName": test_name, "$expr": {"$in": ["$userId", ["$$uid", {"$toString": "$$uid"}]]}}},
+                {"$group": {"_id": None, "value": {best: f"${metric}"}}}
+            ],
+            "as": alias
+        }},
+        {"$addFields": {alias: {"$arrayElemAt": [f"${alias}.value", 0]}}},
+        {"$addFields": {f"{alias}Missing": {"$cond": [{"$in": [{"$type": f"${alias}"}, ["missing", "null"]]}, 1, 0]}}}
+    ]
+
+def is_better_metric(value: Any, held: Any, direction: int) -> bool:
+    """Whether value beats held for a sort direction (-1 prefers the max, 1 the min)"""
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        return False
+    if not isinstance(held, (int, float)) or isinstance(held, bool):
+        return True
+    return value > held if direction == -1 else value < held
+
+# ============ USER TEST SUMMARY ============
+
+# One document per user with count/min/max/best/latest for every (testName, metric),
+# so one-sided metric filters become an indexed $elemMatch instead of a testresults scan
+SUMMARY_METRICS = ["timeTaken", "speed", "distance", "comparisonScore", "jumpHeight", "repsCount"]
+SUMMARY_LOWER_IS_BETTER = ["timeTaken"]
+SUMMARY_READY_CHECK_SECONDS = 30
+
+summary_state = {"ready": False, "checkedAt": 0.0}
+
+def user_test_summary_pipeline(match: Dict[str, Any], into: str) -> List[Dict[str, Any]]:
+    """Aggregate testresults matching match into per-user summaries merged into a collection"""
+    return [
+        {"$match": match},
+        {"$project": {
+            "userId": {"$convert": {"input": "$userId", "to": "objectId", "onError": "$userId", "onNull": None}},
+            "testName": 1,
+            "at": {"$ifNull": ["$date", "$createdAt"]},
+            "metrics": {"$filter": {
+                "input": [{"m": metric, "v": f"${metric}"} for metric in SUMMARY_METRICS],
+                "cond": {"$isNumber": "$$this.v"}
+            }}
+        }},
+        {"$match": {"userId": {"$ne": None}}},
+        {"$unwind": "$metrics"},
+        {"$group": {
+            "_id": {"u": "$userId", "t": "$testName", "m": "$metrics.m"},
+            "count": {"$sum": 1},
+            "min": {"$min": "$metrics.v"},
+            "max": {"$max": "$metrics.v"},
+            "latest": {"$max": {"at": "$at", "v": "$metrics.v"}}
+        }},
+        {"$group": {
+            "_id": "$_id.u",
+            "metrics": {"$push": {
+                "t": "$_id.t",
+                "m": "$_id.m",
+                "count": "$count",
+                "min": "$min",
+                "max": "$max",
+                "best": {"$cond": [{"$in": ["$_id.m", SUMMARY_LOWER_IS_BETTER]}, "$min", "$max"]},
+                "latest": "$latest.v",
+                "latestAt": "$latest.at"
+            }}
+        }},
+        {"$addFields": {"updatedAt": "$$NOW"}},
+        {"$merge": {"into": into, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+    ]
+
+async def refresh_user_test_summaries(user_ids: List[Any]):
+    """Recompute the summaries of the given users from their test results"""
+    object_ids = list({oid for oid in (to_object_id(uid) for uid in user_ids) if oid})
+    if not object_ids:
+        return
+    match = {"userId": {"$in": object_ids + [str(oid) for oid in object_ids]}}
+    await db.testresults.aggregate(user_test_summary_pipeline(match, "user_test_summary"), allowDiskUse=True).to_list(None)
+
+@ingest_handler("user_test_summary", "testresults")
+async def apply_new_tests_to_summary(tests: List[dict]):
+    # Until the first full build the rebuild's watermark covers everything
+    if await db.sync_state.find_one({"_id": "user_test_summary", "builtAt": {"$exists": True}}, {"_id": 1}):
+        await refresh_user_test_summaries([t.get("userId") for t in tests])
+
+async def _rebuild_user_test_summary() -> Dict[str, Any]:
+    """Rebuild user_test_summary from scratch into a side collection, then swap it in"""
+    watermark = await latest_watermark(db.testresults, "createdAt")
+    staging = "user_test_summary_rebuild"
+    await db[staging].drop()
+    await db[staging].create_indexes([IndexModel(keys) for keys in INDEX_SPECS["user_test_summary"]])
+    await db.testresults.aggregate(user_test_summary_pipeline({}, staging), allowDiskUse=True).to_list(None)
+    await db[staging].rename("user_test_summary", dropTarget=True)
+    await set_watermark("user_test_summary", watermark)
+    
+    built_at = datetime.now(timezone.utc)
+    await db.sync_state.update_one({"_id": "user_test_summary"}, {"$set": {"builtAt": built_at}}, upsert=True)
+    summary_state.update(ready=True, checkedAt=time.monotonic())
+    users = await db.user_test_summary.estimated_document_count()
+    logger.info(f"User test summary rebuilt for {users} users")
+    return {"users": users, "builtAt": built_at.isoformat()}
+
+async def rebuild_user_test_summary(wait_seconds: float = 120) -> Dict[str, Any]:
+    """Full rebuild of the user test summary under the ingest lease"""
+    async with ingest_lease(wait_seconds) as acquired:
+        if not acquired:
+            raise RuntimeError("Ingest lease is held by another worker")
+        return await _rebuild_user_test_summary()
+
+async def user_test_summary_ready() -> bool:
+    """Whether a full build of user_test_summary has completed"""
+    if time.monotonic() - summary_state["checkedAt"] >= SUMMARY_READY_CHECK_SECONDS:
+        summary_state.update(
+            ready=await db.sync_state.find_one({"_id": "user_test_summary", "builtAt": {"$exists": True}}, {"_id": 1}) is not None,
+            checkedAt=time.monotonic()
+        )
+    return summary_state["ready"]
+
+def summary_clause(tf: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Summary form of a test filter, None when min/max cannot answer it exactly"""
+    condition = tf["condition"]
+    if tf["metric"] not in SUMMARY_METRICS or not isinstance(condition, dict) or not condition:
+        return None
+    if not all(is_number(v) for v in condition.values()):
+        return None
+    if set(condition) <= {"$gt", "$gte"}:
+        bound = "max"  # some result exceeds the bound iff the best high value does
+    elif set(condition) <= {"$lt", "$lte"}:
+        bound = "min"
+    else:
+        return None
+    return {"metrics": {"$elemMatch": {"t": tf["testName"], "m": tf["metric"], bound: condition}}}
+
+def summary_filter_stages(test_filters: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+    """user_test_summary pipeline for the test filters, None unless every clause is routable"""
+    clauses = [summary_clause(tf) for tf in test_filters]
+    if not clauses or any(clause is None for clause in clauses):
+        return None
+    return [
+        {"$match": clauses[0] if len(clauses) == 1 else {"$and": clauses}},
+        {"$lookup": {"from": "users", "localField": "_id", "foreignField": "_id", "as": "user"}},
+        {"$unwind": "$user"},
+        {"$replaceRoot": {"newRoot": "$user"}}
+    ]
+
+# ============ TEST METRIC BITMAP INDEX ============
+
+# In-process index for testFilter clauses: every numeric test result is an entry
+# (value, user ordinal) under its (testName, metric), sorted by value and cut into
+# equal-count buckets that each carry a packed bitset of the users they contain.
+# A range is the OR of the buckets it covers plus its two partial edges, and
+# clauses are ANDed, so a query never touches testresults.
+#
+# The index lives in process memory, so every worker that enables it holds its own
+# copy (up to BITMAP_MAX_BYTES each) and scans testresults every BITMAP_REFRESH_SECONDS.
+# A "bitmap-scan" lease lets only one worker scan at a time; size the budget as
+# workers x BITMAP_MAX_BYTES when turning it on.
+BITMAP_ENABLED = os.environ.get("BITMAP_ENABLED", "false").lower() == "true"
+BITMAP_REFRESH_SECONDS = float(os.environ.get("BITMAP_REFRESH_SECONDS", "300"))
+BITMAP_MAX_AGE_SECONDS = float(os.environ.get("BITMAP_MAX_AGE_SECONDS", "900"))
+BITMAP_BUCKETS = int(os.environ.get("BITMAP_BUCKETS", "32"))
+BITMAP_MAX_BYTES = int(os.environ.get("BITMAP_MAX_BYTES", str(512 * 1024 * 1024)))
+BITMAP_MAX_MATCHES = int(os.environ.get("BITMAP_MAX_MATCHES", "100000"))
+BITMAP_SCAN_LEASE_SECONDS = float(os.environ.get("BITMAP_SCAN_LEASE_SECONDS", "600"))
+BITMAP_SCAN_RETRY_SECONDS = 30
+BITMAP_OPERATORS = {"$gt", "$gte", "$lt", "$lte", "$eq"}
+# Scan-time estimate: value + ordinal, held twice while sorting, and the per-user
+# ObjectId -> ordinal dict entry
+BITMAP_ENTRY_BYTES = 24
+BITMAP_USER_BYTES = 200
+
+class BitmapBudgetExceeded(Exception):
+    pass
+
+bitmap_state = {"index": None, "builtAt": None, "buildSeconds": None, "error": None}
+
+def packed_bitset(ordinals: np.ndarray, n_users: int) -> np.ndarray:
+    bits = np.zeros(n_users, dtype=bool)
+    bits[ordinals] = True
+    return np.packbits(bits)
+
+class MetricBitmap:
+    """Sorted values of one (testName, metric) with a user bitset per value bucket"""
+    
+    def __init__(self, values: np.ndarray, ordinals: np.ndarray, n_users: int, buckets: int):
+        order = np.argsort(values, kind="stable")
+        self.values = values[order]
+        self.ordinals = ordinals[order]
+        self.n_users = n_users
+        self.bounds = np.unique(np.linspace(0, len(values), buckets + 1).astype(np.int64))
+        self.bitmaps = np.stack([
+            packed_bitset(self.ordinals[start:end], n_users)
+            for start, end in zip(self.bounds[:-1], self.bounds[1:])
+        ])
+    
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + self.ordinals.nbytes + self.bounds.nbytes + self.bitmaps.nbytes
+    
+    def positions(self, condition: Dict[str, float]) -> Tuple[int, int]:
+        """Sorted-position range [low, high) of the entries satisfying condition"""
+        low, high = 0, len(self.values)
+        for op, operand in condition.items():
+            if op in ("$gt", "$gte", "$eq"):
+                low = max(low, int(np.searchsorted(self.values, operand, side="right" if op == "$gt" else "left")))
+            if op in ("$lt", "$lte", "$eq"):
+                high = min(high, int(np.searchsorted(self.values, operand, side="left" if op == "$lt" else "right")))
+        return low, high
+    
+    def match(self, condition: Dict[str, float]) -> np.ndarray:
+        """Bitset of users with at least one entry satisfying condition"""
+        low, high = self.positions(condition)
+        if low >= high:
+            return packed_bitset(self.ordinals[:0], self.n_users)
+        # Buckets [first, last) lie entirely inside the range; the edges are set directly
+        first = int(np.searchsorted(self.bounds, low, side="left"))
+        last = int(np.searchsorted(self.bounds, high, side="right")) - 1
+        if first >= last:
+            return packed_bitset(self.ordinals[low:high], self.n_users)
+        edges = np.concatenate([self.ordinals[low:self.bounds[first]], self.ordinals[self.bounds[last]:high]])
+        return np.bitwise_or.reduce(self.bitmaps[first:last], axis=0) | packed_bitset(edges, self.n_users)
+
+class TestBitmapIndex:
+    """MetricBitmaps for every (testName, metric) over dense user ordinals"""
+    
+    def __init__(self, user_ids: np.ndarray, metrics: Dict[Tuple[str, str], MetricBitmap]):
+        self.user_ids = user_ids  # (n_users, 12) ObjectId bytes, row = ordinal
+        self.metrics = metrics
+    
+    @classmethod
+    def build(cls, ordinals: Dict[ObjectId, int], columns: Dict[Tuple[str, str], Tuple[array.array, array.array]]) -> "TestBitmapIndex":
+        n_users = len(ordinals)
+        user_ids = np.frombuffer(b"".join(oid.binary for oid in ordinals), dtype=np.uint8).reshape(-1, 12)
+        metrics = {
+            key: MetricBitmap(np.asarray(values, dtype=np.float64), np.asarray(owners, dtype=np.int32), n_users, BITMAP_BUCKETS)
+            for key, (values, owners) in columns.items()
+        }
+        return cls(user_ids, metrics)
+    
+    def memory(self) -> Dict[str, int]:
+        bitmaps = sum(m.bitmaps.nbytes for m in self.metrics.values())
+        entries = sum(m.nbytes for m in self.metrics.values()) - bitmaps
+        return {"bitmaps": bitmaps, "entries": entries, "userIds": self.user_ids.nbytes, "total": bitmaps + entries + self.user_ids.nbytes}
+    
+    def match(self, test_filters: List[Dict[str, Any]]) -> Optional[List[ObjectId]]:
+        """User ids satisfying every test filter, None if some clause is not indexable"""
+        result = None
+        for tf in test_filters:
+            condition = bitmap_condition(tf["condition"])
+            if condition is None or tf["metric"] not in SUMMARY_METRICS:
+                return None
+            metric = self.metrics.get((tf["testName"], tf["metric"]))
+            if metric is None:
+                return []  # no numeric results for this test/metric
+            bits = metric.match(condition)
+            result = bits if result is None else result & bits
+        if result is None:
+            return None
+        ordinals = np.flatnonzero(np.unpackbits(result, count=len(self.user_ids)))
+        return [ObjectId(self.user_ids[ordinal].tobytes()) for ordinal in ordinals]
+
+def bitmap_condition(condition: Any) -> Optional[Dict[str, float]]:
+    """Numeric comparison form of a test filter condition, None when it is not indexable"""
+    if is_number(condition):
+        return {"$eq": condition}
+    if not isinstance(condition, dict) or not condition or not set(condition) <= BITMAP_OPERATORS:
+        return None
+    if not all(is_number(v) for v in condition.values()):
+        return None
+    return condition
+
+def bitmap_estimate(entries: int, n_users: int, n_keys: int) -> int:
+    """Approximate peak bytes of an index build with these counts"""
+    return entries * BITMAP_ENTRY_BYTES + n_users * BITMAP_USER_BYTES + n_keys * BITMAP_BUCKETS * ((n_users + 7) // 8)
+
+async def build_test_bitmap_index() -> TestBitmapIndex:
+    """Scan testresults once into per-(testName, metric) value/ordinal columns.
+    
+    Raises BitmapBudgetExceeded as soon as the scan outgrows BITMAP_MAX_BYTES.
+    """
+    ordinals: Dict[ObjectId, int] = {}
+    columns: Dict[Tuple[str, str], Tuple[array.array, array.array]] = {}
+    entries = 0
+    scanned = 0
+    projection = {"_id": 0, "userId": 1, "testName": 1, **{metric: 1 for metric in SUMMARY_METRICS}}
+    async for doc in db.testresults.find({}, projection).batch_size(EXPORT_BATCH_SIZE):
+        scanned += 1
+        if scanned % EXPORT_BATCH_SIZE == 0:
+            estimate = bitmap_estimate(entries, len(ordinals), len(columns))
+            if estimate > BITMAP_MAX_BYTES:
+                raise BitmapBudgetExceeded(f"Index needs more than {estimate} bytes after {scanned} test results, budget is {BITMAP_MAX_BYTES}")
+        user_id = to_object_id(doc.get("userId"))
+        if not user_id:
+            continue
+        ordinal = ordinals.setdefault(user_id, len(ordinals))
+        for metric in SUMMARY_METRICS:
+            value = doc.get(metric)
+            if is_number(value) and value == value:  # NaN never satisfies a range
+                values, owners = columns.setdefault((doc.get("testName"), metric), (array.array("d"), array.array("i")))
+                values.append(value)
+                owners.append(ordinal)
+                entries += 1
+    return await asyncio.to_thread(TestBitmapIndex.build, ordinals, columns)
+
+async def refresh_test_bitmap_index():
+    """Rebuild the bitmap index and swap it in if it fits the memory budget.
+    
+    An over-budget build is abandoned and the previous index is kept until it ages out.
+    """
+    started = time.monotonic()
+    try:
+        index = await build_test_bitmap_index()
+        total = index.memory()["total"]
+        if total > BITMAP_MAX_BYTES:
+            raise BitmapBudgetExceeded(f"Index needs {total} bytes, budget is {BITMAP_MAX_BYTES}")
+    except BitmapBudgetExceeded as e:
+        bitmap_state.update(error=str(e))
+        logger.warning(f"Bitmap index not refreshed: {e}")
+        return
+    bitmap_state.update(
+        index=index,
+        builtAt=datetime.now(timezone.utc),
+        buildSeconds=round(time.monotonic() - started, 3),
+        error=None
+    )
+
+async def bitmap_loop():
+    while True:
+        delay = BITMAP_SCAN_RETRY_SECONDS
+        try:
+            # One worker scans testresults at a time; the others retry shortly
+            if await acquire_lease("bitmap-scan", BITMAP_SCAN_LEASE_SECONDS):
+                try:
+                    await refresh_test_bitmap_index()
+                finally:
+                    await release_lease("bitmap-scan")
+                delay = BITMAP_REFRESH_SECONDS
+        except Exception as e:
+            logger.error(f"Bitmap index refresh error: {e}")
+        await asyncio.sleep(delay)
+
+def warm_bitmap_index() -> Optional[TestBitmapIndex]:
+    """The bitmap index if it was built recently enough to answer queries"""
+    built_at = bitmap_state["builtAt"]
+    if bitmap_state["index"] is None or built_at is None:
+        return None
+    if (datetime.now(timezone.utc) - built_at).total_seconds() > BITMAP_MAX_AGE_SECONDS:
+        return None
+    return bitmap_state["index"]
+
+def bitmap_status() -> Dict[str, Any]:
+    index = bitmap_state["index"]
+    return {
+        "enabled": BITMAP_ENABLED,
+        "warm": warm_bitmap_index() is not None,
+        "builtAt": bitmap_state["builtAt"].isoformat() if bitmap_state["builtAt"] else None,
+        "buildSeconds": bitmap_state["buildSeconds"],
+        "error": bitmap_state["error"],
+        "users": len(index.user_ids) if index else 0,
+        "keys": len(index.metrics) if index else 0,
+        "buckets": BITMAP_BUCKETS,
+        "bytes": index.memory() if index else None,
+        "maxBytes": BITMAP_MAX_BYTES
+    }
+
+# ============ COLUMNAR ANALYTICS ============
+
+# Optional in-process engine for grouped /admin/query requests: a periodically
+# refreshed snapshot of the query builder's user dimensions and the testresults
+# metrics held as NumPy columns. Numeric fields are float64 arrays; everything else
+# is dictionary-encoded, so a filter is evaluated once per distinct value and mapped
+# through the codes. Columns are filled while the cursors stream, and a build that
+# outgrows ANALYTICS_MAX_BYTES is abandoned. Queries on other fields, or needing
+# semantics it does not model, go to MongoDB unchanged.
+ANALYTICS_ENABLED = os.environ.get("ANALYTICS_ENABLED", "false").lower() == "true"
+ANALYTICS_REFRESH_SECONDS = float(os.environ.get("ANALYTICS_REFRESH_SECONDS", "300"))
+ANALYTICS_MAX_AGE_SECONDS = float(os.environ.get("ANALYTICS_MAX_AGE_SECONDS", "900"))
+ANALYTICS_MAX_BYTES = int(os.environ.get("ANALYTICS_MAX_BYTES", str(256 * 1024 * 1024)))
+ANALYTICS_USER_FIELDS = os.environ.get("ANALYTICS_USER_FIELDS", ",".join(
+    ["age", "gender", "state", "city", "currentXP", "currentLevel", "testsCompleted", "verification.status"]
+    + [f"categoryScores.{category}" for category in SNAPSHOT_CATEGORIES]
+)).split(",")
+ANALYTICS_OPERATORS = {"$eq", "$ne", "$gt", "$gte", "$lt", "$lte", "$in", "$nin", "$exists"}
+# Scan-time estimates for what is not yet a NumPy array: the ObjectId -> row dict
+# entry per user and one distinct value in a column dictionary
+ANALYTICS_USER_BYTES = 200
+ANALYTICS_DICTIONARY_BYTES = 100
+
+analytics_state = {"snapshot": None, "builtAt": None, "buildSeconds": None, "error": None}
+
+class AnalyticsUnsupported(Exception):
+    """Raised when a query needs semantics the columnar snapshot does not model"""
+
+class AnalyticsBudgetExceeded(Exception):
+    pass
+
+class Missing:
+    """Marker for a field that is absent from a document"""
+    def __repr__(self):
+        return "MISSING"
+
+MISSING = Missing()
+
+def bson_bracket(value: Any) -> str:
+    """Comparison bracket of a scalar: values only compare within one bracket, as in MongoDB"""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "bool"
+    if is_number(value):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, datetime):
+        return "date"
+    if isinstance(value, ObjectId):
+        return "objectId"
+    raise AnalyticsUnsupported(f"Unsupported value type {type(value).__name__}")
+
+def scalar_matches(value: Any, op: str, operand: Any) -> bool:
+    """MongoDB query semantics of one operator against one scalar (or MISSING)"""
+    if op == "$eq":
+        if operand is None:
+            return value is None or value is MISSING
+        if isinstance(operand, (list, dict, re.Pattern)):
+            raise AnalyticsUnsupported("Array, document and regex equality")
+        return value is not MISSING and bson_bracket(value) == bson_bracket(operand) and value == operand
+    if op == "$ne":
+        return not scalar_matches(value, "$eq", operand)
+    if op == "$in":
+        return any(scalar_matches(value, "$eq", item) for item in operand)
+    if op == "$nin":
+        return not scalar_matches(value, "$in", operand)
+    if op == "$exists":
+        return (value is not MISSING) == bool(operand)
+    if operand is None:
+        raise AnalyticsUnsupported("Range comparison against null")
+    if value is MISSING or value is None or bson_bracket(value) != bson_bracket(operand):
+        return False
+    return {"$gt": value > operand, "$gte": value >= operand, "$lt": value < operand, "$lte": value <= operand}[op]
+
+def condition_operators(condition: Any) -> Dict[str, Any]:
+    """Operator form of a field condition, bare values meaning $eq"""
+    if isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+        if not set(condition) <= ANALYTICS_OPERATORS:
+            raise AnalyticsUnsupported(f"Operators {sorted(set(condition) - ANALYTICS_OPERATORS)}")
+        for op in ("$in", "$nin"):
+            if op in condition and not isinstance(condition[op], list):
+                raise AnalyticsUnsupported(f"{op} needs a list")
+        return condition
+    return {"$eq": condition}
+
+class NumericColumn:
+    """float64 values with a presence mask; integer when every value is an int"""
+    
+    def __init__(self, values: np.ndarray, present: np.ndarray, integer: bool, comparable: bool = True):
+        self.values = values
+        self.present = present
+        self.integer = integer
+        self.comparable = comparable  # False when $min/$max would have to order other BSON types
+    
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + self.present.nbytes
+    
+    def scalar(self, value: float) -> Union[int, float]:
+        return int(value) if self.integer else float(value)
+    
+    def mask(self, condition: Any) -> np.ndarray:
+        result = np.ones(len(self.values), dtype=bool)
+        for op, operand in condition_operators(condition).items():
+            result &= self.op_mask(op, operand)
+        return result
+    
+    def op_mask(self, op: str, operand: Any) -> np.ndarray:
+        if op == "$eq":
+            if operand is None:
+                return ~self.present
+            if isinstance(operand, (list, dict, re.Pattern)):
+                raise AnalyticsUnsupported("Array, document and regex equality")
+            if not is_number(operand):
+                return np.zeros(len(self.values), dtype=bool)
+            return self.present & (self.values == operand)
+        if op == "$ne":
+            return ~self.op_mask("$eq", operand)
+        if op == "$in":
+            result = np.zeros(len(self.values), dtype=bool)
+            for item in operand:
+                result |= self.op_mask("$eq", item)
+            return result
+        if op == "$nin":
+            return ~self.op_mask("$in", operand)
+        if op == "$exists":
+            return self.present.copy() if operand else ~self.present
+        if operand is None:
+            raise AnalyticsUnsupported("Range comparison against null")
+        if not is_number(operand):
+            return np.zeros(len(self.values), dtype=bool)
+        compare = {"$gt": np.greater, "$gte": np.greater_equal, "$lt": np.less, "$lte": np.less_equal}[op]
+        return self.present & compare(self.values, operand)
+    
+    def group_codes(self) -> Tuple[np.ndarray, int, Callable[[int], Any]]:
+        """Dense codes per row, their cardinality and a decoder back to values"""
+        distinct = np.unique(self.values[self.present])
+        codes = np.where(self.present, np.searchsorted(distinct, self.values), len(distinct))
+        decode = lambda code: MISSING if code == len(distinct) else self.scalar(distinct[code])
+        return codes, len(distinct) + 1, decode
+    
+    def numeric(self) -> "NumericColumn":
+        return self
+
+class CategoricalColumn:
+    """Dictionary-encoded values: int32 codes into a list of distinct values"""
+    
+    def __init__(self, codes: np.ndarray, dictionary: List[Any]):
+        self.codes = codes
+        self.dictionary = dictionary
+    
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes
+    
+    def mask(self, condition: Any) -> np.ndarray:
+        operators = condition_operators(condition)
+        lookup = np.array([
+            all(scalar_matches(value, op, operand) for op, operand in operators.items())
+            for value in self.dictionary
+        ], dtype=bool)
+        return lookup[self.codes]
+    
+    def group_codes(self) -> Tuple[np.ndarray, int, Callable[[int], Any]]:
+        return self.codes, len(self.dictionary), lambda code: self.dictionary[code]
+    
+    def numeric(self) -> NumericColumn:
+        """Numeric view for aggregation: $sum/$avg skip non-numbers, as MongoDB does"""
+        numbers = [is_number(v) for v in self.dictionary]
+        values = np.array([float(v) if n else 0.0 for v, n in zip(self.dictionary, numbers)], dtype=np.float64)
+        integer = all(isinstance(v, int) for v, n in zip(self.dictionary, numbers) if n)
+        comparable = all(n or v is None or v is MISSING for v, n in zip(self.dictionary, numbers))
+        return NumericColumn(values[self.codes], np.array(numbers, dtype=bool)[self.codes], integer, comparable)
+
+class ColumnBuilder:
+    """Streams one field's values into compact arrays, numeric until the first non-number"""
+    
+    def __init__(self):
+        self.floats = array.array("d")
+        self.present = bytearray()
+        self.ints = bytearray()
+        self.codes: Optional[array.array] = None
+        self.dictionary: List[Any] = []
+        self.codes_by_key: Dict[tuple, int] = {}
+    
+    @property
+    def nbytes(self) -> int:
+        if self.codes is None:
+            return len(self.floats) * 10
+        return len(self.codes) * 4 + len(self.dictionary) * ANALYTICS_DICTIONARY_BYTES
+    
+    def append(self, value: Any):
+        if self.codes is None:
+            if value is MISSING or is_number(value):
+                present = value is not MISSING
+                self.floats.append(float(value) if present else 0.0)
+                self.present.append(present)
+                self.ints.append(present and isinstance(value, int))
+                return
+            self.to_codes()
+        self.codes.append(self.code(value))
+    
+    def code(self, value: Any) -> int:
+        key = ("missing", None) if value is MISSING else (bson_bracket(value), value)
+        code = self.codes_by_key.get(key)
+        if code is None:
+            code = self.codes_by_key[key] = len(self.dictionary)
+            self.dictionary.append(value)
+        return code
+    
+    def to_codes(self):
+        """Dictionary-encode the numbers seen so far"""
+        self.codes = array.array("i")
+        for value, present, integer in zip(self.floats, self.present, self.ints):
+            self.codes.append(self.code((int(value) if integer else value) if present else MISSING))
+        self.floats, self.present, self.ints = None, None, None
+    
+    def finish(self) -> Union[NumericColumn, CategoricalColumn]:
+        if self.codes is None:
+            present = np.frombuffer(self.present, dtype=np.uint8).astype(bool)
+            integer = bool(np.all(np.frombuffer(self.ints, dtype=np.uint8).astype(bool)[present]))
+            return NumericColumn(np.asarray(self.floats, dtype=np.float64), present, integer)
+        return CategoricalColumn(np.asarray(self.codes, dtype=np.int32), self.dictionary)
+
+class AnalyticsSnapshot:
+    """Columnar copy of users and testresults"""
+    
+    def __init__(self, n_users: int, columns: Dict[str, Any],
+                 test_users: np.ndarray, test_names: Dict[str, int], test_codes: np.ndarray,
+                 test_metrics: Dict[str, np.ndarray]):
+        self.n_users = n_users
+        self.columns = columns  # ANALYTICS_USER_FIELDS that held only scalars
+        self.test_users = test_users  # user row per test result, -1 when unknown
+        self.test_names = test_names
+        self.test_codes = test_codes
+        self.test_metrics = test_metrics  # NaN where the metric is not a number
+    
+    def memory(self) -> Dict[str, int]:
+        users = sum(column.nbytes for column in self.columns.values())
+        tests = self.test_users.nbytes + self.test_codes.nbytes + sum(a.nbytes for a in self.test_metrics.values())
+        return {"users": users, "testresults": tests, "total": users + tests}
+    
+    def column(self, path: str) -> Union[NumericColumn, CategoricalColumn]:
+        column = self.columns.get(path)
+        if column is None:
+            raise AnalyticsUnsupported(f"Field {path} is not in the snapshot")
+        return column
+    
+    def filter_mask(self, mongo_filter: Dict[str, Any]) -> np.ndarray:
+        result = np.ones(self.n_users, dtype=bool)
+        for key, value in mongo_filter.items():
+            if key == "$and":
+                for clause in value:
+                    result &= self.filter_mask(clause)
+            elif key == "$or":
+                either = np.zeros(self.n_users, dtype=bool)
+                for clause in value:
+                    either |= self.filter_mask(clause)
+                result &= either
+            elif key.startswith("$"):
+                raise AnalyticsUnsupported(f"Operator {key}")
+            else:
+                result &= self.column(key).mask(value)
+        return result
+    
+    def test_filter_mask(self, test_filters: List[Dict[str, Any]]) -> np.ndarray:
+        """Users with, for every clause, some result of that test satisfying it"""
+        result = np.ones(self.n_users, dtype=bool)
+        for tf in test_filters:
+            condition = bitmap_condition(tf["condition"])
+            if condition is None or tf["metric"] not in self.test_metrics:
+                raise AnalyticsUnsupported(f"testFilter.{tf['testName']}.{tf['metric']}")
+            matched = np.zeros(self.n_users, dtype=bool)
+            code = self.test_names.get(tf["testName"])
+            if code is not None:
+                rows = self.test_codes == code
+                values = self.test_metrics[tf["metric"]]
+                for op, operand in condition.items():
+                    compare = {"$gt": np.greater, "$gte": np.greater_equal, "$lt": np.less,
+                               "$lte": np.less_equal, "$eq": np.equal}[op]
+                    rows &= compare(values, operand)
+                users = self.test_users[rows]
+                matched[users[users >= 0]] = True
+            result &= matched
+        return result
+    
+    def group(self, mongo_filter: Dict[str, Any], test_filters: List[Dict[str, Any]],
+              group_by: List[str], aggregate: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """$group equivalent of execute_query, sorted by count descending"""
+        mask = self.filter_mask(mongo_filter)
+        if test_filters:
+            mask &= self.test_filter_mask(test_filters)
+        rows = np.flatnonzero(mask)
+        
+        keys = np.zeros(len(rows), dtype=np.int64)
+        decoders = []
+        key_space = 1
+        for field in group_by:
+            codes, cardinality, decode = self.column(field).group_codes()
+            key_space *= cardinality
+            if key_space >= 2 ** 62:
+                raise AnalyticsUnsupported("Group key space overflows int64")
+            keys = keys * cardinality + codes[rows]
+            decoders.append((field.replace(".", "_"), codes, decode))
+        _, first, group_ids = np.unique(keys, return_index=True, return_inverse=True)
+        group_ids = group_ids.reshape(-1)
+        n_groups = len(first)
+        counts = np.bincount(group_ids, minlength=n_groups)
+        
+        outputs = {}
+        for agg in aggregate or []:
+            op = agg.get("op", "count")
+            field = agg.get("field", "")
+            alias = agg.get("alias", f"{op}_{field.replace('.', '_')}")
+            if op not in ("avg", "sum", "min", "max"):
+                continue
+            column = self.column(field).numeric()
+            present = column.present[rows]
+            values = column.values[rows]
+            if op in ("min", "max") and not column.comparable:
+                raise AnalyticsUnsupported(f"${op} over mixed types in {field}")
+            numbers = np.bincount(group_ids, weights=present.astype(np.float64), minlength=n_groups)
+            if op in ("sum", "avg"):
+                totals = np.bincount(group_ids, weights=np.where(present, values, 0.0), minlength=n_groups)
+                if op == "sum":
+                    outputs[alias] = [column.scalar(t) if n else 0 for t, n in zip(totals, numbers)]
+                else:
+                    outputs[alias] = [float(t / n) if n else None for t, n in zip(totals, numbers)]
+            else:
+                fill = np.inf if op == "min" else -np.inf
+                extremes = np.full(n_groups, fill)
+                reduce = np.minimum if op == "min" else np.maximum
+                reduce.at(extremes, group_ids[present], values[present])
+                outputs[alias] = [column.scalar(e) if n else None for e, n in zip(extremes, numbers)]
+        
+        results = []
+        for group in np.argsort(-counts, kind="stable"):
+            row = rows[first[group]]
+            group_key = {}
+            for key, codes, decode in decoders:
+                value = decode(int(codes[row]))
+                if value is not MISSING:  # $group omits missing fields from a document _id
+                    group_key[key] = value
+            doc = {"_id": group_key, "count": int(counts[group])}
+            for alias, values in outputs.items():
+                doc[alias] = values[group]
+            results.append(doc)
+        return results
+
+def analytics_value(doc: Dict[str, Any], path: str) -> Any:
+    """Scalar at a dotted path (MISSING when absent); arrays, documents and exotic types are unsupported"""
+    value = doc
+    for part in path.split("."):
+        if isinstance(value, list):
+            raise AnalyticsUnsupported(path)
+        if not isinstance(value, dict) or part not in value:
+            return MISSING
+        value = value[part]
+    if isinstance(value, (list, dict)):
+        raise AnalyticsUnsupported(path)
+    bson_bracket(value)
+    return value
+
+def analytics_budget_check(nbytes: int, scanned: str):
+    if nbytes > ANALYTICS_MAX_BYTES:
+        raise AnalyticsBudgetExceeded(f"Snapshot needs more than {nbytes} bytes after {scanned}, budget is {ANALYTICS_MAX_BYTES}")
+
+async def build_analytics_snapshot() -> AnalyticsSnapshot:
+    """Stream users and testresults once, filling the columns batch by batch.
+    
+    Raises AnalyticsBudgetExceeded as soon as the build outgrows ANALYTICS_MAX_BYTES.
+    """
+    builders = {path: ColumnBuilder() for path in ANALYTICS_USER_FIELDS}
+    user_rows: Dict[ObjectId, int] = {}
+    projection = {path: 1 for path in ANALYTICS_USER_FIELDS}
+    async for doc in db.users.find({}, projection).batch_size(EXPORT_BATCH_SIZE):
+        user_rows[doc["_id"]] = len(user_rows)
+        for path in list(builders):
+            try:
+                builders[path].append(analytics_value(doc, path))
+            except AnalyticsUnsupported:
+                del builders[path]  # queries on this field go to MongoDB
+        if len(user_rows) % EXPORT_BATCH_SIZE == 0:
+            users_bytes = len(user_rows) * ANALYTICS_USER_BYTES + sum(b.nbytes for b in builders.values())
+            analytics_budget_check(users_bytes, f"{len(user_rows)} users")
+    users_bytes = len(user_rows) * ANALYTICS_USER_BYTES + sum(b.nbytes for b in builders.values())
+    
+    test_users, test_codes = array.array("i"), array.array("i")
+    test_names: Dict[str, int] = {}
+    metric_values = {metric: array.array("d") for metric in SUMMARY_METRICS}
+    test_row_bytes = 8 + 8 * len(SUMMARY_METRICS)
+    projection = {"_id": 0, "userId": 1, "testName": 1, **{metric: 1 for metric in SUMMARY_METRICS}}
+    async for doc in db.testresults.find({}, projection).batch_size(EXPORT_BATCH_SIZE):
+        test_users.append(user_rows.get(to_object_id(doc.get("userId")), -1))
+        test_codes.append(test_names.setdefault(doc.get("testName"), len(test_names)))
+        for metric, values in metric_values.items():
+            value = doc.get(metric)
+            values.append(float(value) if is_number(value) else np.nan)
+        if len(test_codes) % EXPORT_BATCH_SIZE == 0:
+            analytics_budget_check(users_bytes + len(test_codes) * test_row_bytes, f"{len(test_codes)} test results")
+    
+    def encode():
+        return AnalyticsSnapshot(
+            len(user_rows), {path: builder.finish() for path, builder in builders.items()},
+            np.asarray(test_users, dtype=np.int32), test_names, np.asarray(test_codes, dtype=np.int32),
+            {metric: np.asarray(values, dtype=np.float64) for metric, values in metric_values.items()}
+        )
+    return await asyncio.to_thread(encode)
+
+async def refresh_analytics_snapshot():
+    """Rebuild the snapshot; an over-budget build is abandoned and the previous one kept"""
+    started = time.monotonic()
+    try:
+        snapshot = await build_analytics_snapshot()
+        total = snapshot.memory()["total"]
+        if total > ANALYTICS_MAX_BYTES:
+            raise AnalyticsBudgetExceeded(f"Snapshot needs {total} bytes, budget is {ANALYTICS_MAX_BYTES}")
+    except AnalyticsBudgetExceeded as e:
+        analytics_state.update(error=str(e))
+        logger.warning(f"Analytics snapshot not refreshed: {e}")
+        return
+    analytics_state.update(
+        snapshot=snapshot,
+        builtAt=datetime.now(timezone.utc),
+        buildSeconds=round(time.monotonic() - started, 3),
+        error=None
+    )
+
+async def analytics_loop():
+    while True:
+        try:
+            await refresh_analytics_snapshot()
+        except Exception as e:
+            logger.error(f"Analytics snapshot refresh error: {e}")
+        await asyncio.sleep(ANALYTICS_REFRESH_SECONDS)
+
+def warm_analytics_snapshot() -> Optional[AnalyticsSnapshot]:
+    """The analytics snapshot if it was refreshed recently enough to answer queries"""
+    built_at = analytics_state["builtAt"]
+    if analytics_state["snapshot"] is None or built_at is None:
+        return None
+    if (datetime.now(timezone.utc) - built_at).total_seconds() > ANALYTICS_MAX_AGE_SECONDS:
+        return None
+    return analytics_state["snapshot"]
+
+def columnar_group(mongo_filter: Dict[str, Any], test_filters: List[Dict[str, Any]],
+                   group_by: List[str], aggregate: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+    """Grouped rows from the analytics snapshot, None when MongoDB has to answer"""
+    snapshot = warm_analytics_snapshot()
+    if snapshot is None:
+        return None
+    try:
+        return snapshot.group(mongo_filter, test_filters, group_by, aggregate)
+    except AnalyticsUnsupported as e:
+        logger.debug(f"Columnar analytics fallback: {e}")
+        return None
+
+def analytics_status() -> Dict[str, Any]:
+    snapshot = analytics_state["snapshot"]
+    return {
+        "enabled": ANALYTICS_ENABLED,
+        "warm": warm_analytics_snapshot() is not None,
+        "builtAt": analytics_state["builtAt"].isoformat() if analytics_state["builtAt"] else None,
+        "buildSeconds": analytics_state["buildSeconds"],
+        "error": analytics_state["error"],
+        "users": snapshot.n_users if snapshot else 0,
+        "testresults": len(snapshot.test_codes) if snapshot else 0,
+        "columns": sorted(snapshot.columns) if snapshot else [],
+        "bytes": snapshot.memory() if snapshot else None,
+        "maxBytes": ANALYTICS_MAX_BYTES
+    }
+
+# ============ RESULT CACHE ============
+
+# JSON bodies of read endpoints keyed by a canonical hash of their parameters plus
+# the version counters of the collections they read. Writers bump the counters, so
+# a changed collection simply stops producing hits and old entries age out of the LRU.
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_VERSIONS_ID = "cache_versions"
+
+class ResultCache:
+    """LRU of encoded response bodies bounded by total byte size"""
+    
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.endpoints: Dict[str, Dict[str, int]] = {}
+    
+    def get(self, key: str, endpoint: str) -> Optional[bytes]:
+        stats = self.endpoints.setdefault(endpoint, {"hits": 0, "misses": 0})
+        body = self.entries.get(key)
+        if body is None:
+            self.misses += 1
+            stats["misses"] += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        stats["hits"] += 1
+        return body
+    
+    def put(self, key: str, body: bytes):
+        size = len(key) + len(body)
+        if size > self.max_bytes:
+            return
+        if key in self.entries:
+            self.bytes -= len(key) + len(self.entries.pop(key))
+        self.entries[key] = body
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            old_key, old_body = self.entries.popitem(last=False)
+            self.bytes -= len(old_key) + len(old_body)
+            self.evictions += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "maxBytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hitRate": round(self.hits / lookups, 4) if lookups else None,
+            "endpoints": self.endpoints
+        }
+
+result_cache = ResultCache(RESULT_CACHE_MAX_BYTES)
+
+async def cache_versions(collections: List[str]) -> Dict[str, int]:
+    doc = await db.sync_state.find_one({"_id": CACHE_VERSIONS_ID}) or {}
+    return {name: doc.get(name, 0) for name in collections}
+
+async def bump_cache_versions(*collections: str):
+    """Invalidate every cached result that read one of the collections"""
+    if collections:
+        await db.sync_state.update_one({"_id": CACHE_VERSIONS_ID}, {"$inc": {name: 1 for name in collections}}, upsert=True)
+
+def canonical_filter(value: Any, top_level: bool = False) -> Any:
+    """Equivalent filters in one spelling: bare lists as $in, sorted $in/$nin, lone $eq unwrapped"""
+    if not isinstance(value, dict):
+        return value
+    result = {}
+    for key, item in value.items():
+        if key in ("$and", "$or", "$nor") and isinstance(item, list):
+            result[key] = [canonical_filter(clause) for clause in item]
+        elif key in ("$in", "$nin") and isinstance(item, list):
+            result[key] = sorted({json.dumps(v, sort_keys=True, default=json_default): v for v in item}.values(),
+                                 key=lambda v: json.dumps(v, sort_keys=True, default=json_default))
+        elif top_level and not key.startswith("$") and isinstance(item, list):
+            result[key] = canonical_filter({"$in": item})  # build_mongo_filter semantics
+        elif isinstance(item, dict) and list(item) == ["$eq"] and not isinstance(item["$eq"], (dict, list)):
+            result[key] = item["$eq"]
+        else:
+            result[key] = canonical_filter(item)
+    return result
+
+def test_filter_order(filters: Dict[str, Any]) -> List[str]:
+    """testFilter keys in the order execute_query extracts them, which shapes its output"""
+    keys = [k for k in filters if k.startswith("testFilter.")]
+    for combinator in ("$and", "$or"):
+        for clause in filters.get(combinator) or []:
+            if isinstance(clause, dict):
+                keys.extend(k for k in clause if k.startswith("testFilter."))
+    return keys
+
+def cache_params(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    params = {}
+    for name, value in arguments.items():
+        if isinstance(value, QueryFilter):
+            value = value.model_dump()
+            filters = value.get("filters") or {}
+            value["filters"] = canonical_filter(filters, top_level=True)
+            value["testFilterOrder"] = test_filter_order(filters)
+            for field in ("sort", "groupBy", "aggregate"):
+                value[field] = value.get(field) or []
+        elif isinstance(value, BaseModel):
+            value = value.model_dump()
+        params[name] = value
+    return params
+
+def result_cache_key(endpoint: str, arguments: Dict[str, Any], versions: Dict[str, int]) -> str:
+    payload = {"endpoint": endpoint, "params": cache_params(arguments), "versions": versions}
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=json_default)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+def result_cached(endpoint: str, collections: List[str]):
+    """Serve an endpoint's JSON body from result_cache until one of collections changes"""
+    def register(fn: Callable[..., Awaitable[Any]]):
+        signature = inspect.signature(fn)
+        
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            arguments = signature.bind(*args, **kwargs)
+            arguments.apply_defaults()
+            try:
+                versions = await cache_versions(collections)
+            except Exception as e:
+                logger.error(f"Result cache versions error: {e}")
+                # Handlers leave ObjectId/datetime values for render_json, so serve uncached through it
+                return FastJSONResponse(await fn(*args, **kwargs), headers={"X-Cache": "BYPASS"})
+            key = result_cache_key(endpoint, arguments.arguments, versions)
+            body = result_cache.get(key, endpoint)
+            status = "HIT"
+            if body is None:
+                status = "MISS"
+                body, _ = await single_flight.run(endpoint, key, lambda: fn(*args, **kwargs))
+                result_cache.put(key, body)
+            return Response(content=body, media_type="application/json", headers={"X-Cache": status})
+        return wrapper
+    return register
+
+# ============ REQUEST COALESCING ============
+
+# Concurrent identical requests share one computation. Within a worker they await
+# the same task; across workers a FlightBackend elects one leader per key and
+# hands its encoded body to the followers.
+COALESCE_BACKEND = os.environ.get("COALESCE_BACKEND", "process")  # process, file
+COALESCE_DIR = Path(os.environ.get("COALESCE_DIR", "/dev/shm/sai-flight" if os.path.isdir("/dev/shm") else os.path.join(tempfile.gettempdir(), "sai-flight")))
+COALESCE_WAIT_SECONDS = float(os.environ.get("COALESCE_WAIT_SECONDS", "30"))
+COALESCE_POLL_SECONDS = float(os.environ.get("COALESCE_POLL_SECONDS", "0.05"))
+COALESCE_RESULT_SECONDS = float(os.environ.get("COALESCE_RESULT_SECONDS", "5"))
+
+class ProcessFlightBackend:
+    """No cross-worker coordination: every worker leads its own flights"""
+    name = "process"
+    
+    async def acquire(self, key: str) -> bool:
+        return True
+    
+    async def publish(self, key: str, body: bytes):
+        pass
+    
+    async def release(self, key: str):
+        pass
+    
+    async def wait(self, key: str, timeout: float) -> Optional[bytes]:
+        return None
+
+class FileFlightBackend:
+    """Workers on one host coordinate through flock()ed lock files and result files"""
+    name = "file"
+    
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.handles: Dict[str, Any] = {}
+    
+    def path(self, key: str, suffix: str) -> Path:
+        return self.directory / f"{key}.{suffix}"
+    
+    async def acquire(self, key: str) -> bool:
+        path = self.path(key, "lock")
+        handle = open(path, "a")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            handle.close()
+            return False
+        # The previous holder may have unlinked the file between our open and flock;
+        # a lock on an orphaned inode excludes nobody, so treat the key as taken
+        try:
+            if os.stat(path).st_ino != os.fstat(handle.fileno()).st_ino:
+                raise FileNotFoundError(path)
+        except FileNotFoundError:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+            handle.close()
+            return False
+        self.handles[key] = handle
+        return True
+    
+    async def publish(self, key: str, body: bytes):
+        path = self.path(key, "json")
+        
+        def write():
+            part = path.with_suffix(f".{WORKER_ID}.part")
+            part.write_bytes(body)
+            os.replace(part, path)
+        await asyncio.to_thread(write)
+        asyncio.get_running_loop().call_later(COALESCE_RESULT_SECONDS, lambda: path.unlink(missing_ok=True))
+    
+    async def release(self, key: str):
+        handle = self.handles.pop(key, None)
+        if handle:
+            # Unlinked while still held so lock files do not pile up in tmpfs
+            self.path(key, "lock").unlink(missing_ok=True)
+            fcntl.flock(handle, fcntl.LOCK_UN)
+            handle.close()
+    
+    async def wait(self, key: str, timeout: float) -> Optional[bytes]:
+        """Body published by the current leader, None if it gave up or timed out"""
+        since = time.time()
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(COALESCE_POLL_SECONDS)
+            if not await self.acquire(key):
+                continue
+            await self.release(key)
+            
+            def read() -> Optional[bytes]:
+                path = self.path(key, "json")
+                try:
+                    return path.read_bytes() if path.stat().st_mtime >= since else None
+                except FileNotFoundError:
+                    return None
+            return await asyncio.to_thread(read)
+        return None
+
+class SingleFlight:
+    """Run one computation per key at a time and share its encoded body"""
+    
+    def __init__(self, backend):
+        self.backend = backend
+        self.inflight: Dict[str, asyncio.Future] = {}
+        self.metrics: Dict[str, Dict[str, int]] = {}
+    
+    async def run(self, endpoint: str, key: str, compute: Callable[[], Awaitable[Any]]) -> Tuple[bytes, bool]:
+        """(body, shared): shared is True when another request computed the body"""
+        stats = self.metrics.setdefault(endpoint, {"executed": 0, "coalesced": 0, "coalescedRemote": 0})
+        flight = self.inflight.get(key)
+        if flight is not None:
+            stats["coalesced"] += 1
+            body, _ = await asyncio.shield(flight)
+            return body, True
+        flight = asyncio.ensure_future(self.lead(stats, key, compute))
+        self.inflight[key] = flight
+        flight.add_done_callback(lambda _: self.inflight.pop(key, None))
+        # Shielded so a disconnecting leader does not cancel the followers' result
+        return await asyncio.shield(flight)
+    
+    async def lead(self, stats: Dict[str, int], key: str, compute: Callable[[], Awaitable[Any]]) -> Tuple[bytes, bool]:
+        if await self.backend.acquire(key):
+            try:
+                stats["executed"] += 1
+                body = render_json(await compute())
+                await self.backend.publish(key, body)
+                return body, False
+            finally:
+                await self.backend.release(key)
+        body = await self.backend.wait(key, COALESCE_WAIT_SECONDS)
+        if body is not None:
+            stats["coalescedRemote"] += 1
+            return body, True
+        stats["executed"] += 1
+        return render_json(await compute()), False
+    
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.backend.name, "inflight": len(self.inflight), "endpoints": self.metrics}
+
+def flight_backend():
+    if COALESCE_BACKEND == "file":
+        if fcntl is not None:
+            return FileFlightBackend(COALESCE_DIR)
+        logger.warning("File coalescing needs fcntl; coalescing within each worker only")
+    return ProcessFlightBackend()
+
+single_flight = SingleFlight(flight_backend())
+
+# ============ STALE-WHILE-REVALIDATE ============
+
+# Endpoints that tolerate some staleness answer from memory: past the soft TTL the
+# cached body is still served while one background refresh runs; past the hard TTL
+# the request waits for a fresh computation.
+DASHBOARD_CACHE_SOFT_SECONDS = float(os.environ.get("DASHBOARD_CACHE_SOFT_SECONDS", "30"))
+DASHBOARD_CACHE_HARD_SECONDS = float(os.environ.get("DASHBOARD_CACHE_HARD_SECONDS", "300"))
+FILTER_OPTIONS_CACHE_SOFT_SECONDS = float(os.environ.get("FILTER_OPTIONS_CACHE_SOFT_SECONDS", "300"))
+FILTER_OPTIONS_CACHE_HARD_SECONDS = float(os.environ.get("FILTER_OPTIONS_CACHE_HARD_SECONDS", "3600"))
+
+swr_entries: Dict[str, Dict[str, Any]] = {}
+swr_endpoints: List[Callable[..., Awaitable[Response]]] = []
+
+def stale_while_revalidate(endpoint: str, soft_ttl: float, hard_ttl: float,
+                           bypass: Optional[Callable[[Dict[str, Any]], bool]] = None):
+    """Serve an endpoint from memory, refreshing in the background once soft_ttl has passed.
+    
+    Computations go through single_flight, so concurrent misses and refreshes of
+    the same key run once. Responses carry Age and Cache-Control.
+    """
+    def register(fn: Callable[..., Awaitable[Any]]):
+        signature = inspect.signature(fn)
+        
+        async def compute(key: str, arguments: inspect.BoundArguments) -> Dict[str, Any]:
+            response = next((v for v in arguments.arguments.values() if isinstance(v, Response)), None)
+            body, shared = await single_flight.run(endpoint, key, lambda: fn(*arguments.args, **arguments.kwargs))
+            headers = {}
+            if response is not None and not shared:
+                # Headers the computation set on its injected Response (e.g. Server-Timing)
+                headers = {k: v for k, v in response.headers.items() if k not in ("content-length", "content-type")}
+            entry = {"body": body, "headers": headers, "storedAt": time.monotonic(), "refresh": None}
+            swr_entries[key] = entry
+            return entry
+        
+        async def refresh(key: str, arguments: inspect.BoundArguments):
+            try:
+                await compute(key, arguments)
+            except Exception as e:
+                logger.error(f"Background refresh of {endpoint} failed: {e}")
+                if key in swr_entries:
+                    swr_entries[key]["refresh"] = None
+        
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            arguments = signature.bind(*args, **kwargs)
+            arguments.apply_defaults()
+            if bypass and bypass(arguments.arguments):
+                return await fn(*args, **kwargs)
+            params = {k: v for k, v in arguments.arguments.items() if not isinstance(v, Response)}
+            key = result_cache_key(endpoint, params, {})
+            
+            entry = swr_entries.get(key)
+            age = time.monotonic() - entry["storedAt"] if entry else None
+            if entry is None or age >= hard_ttl:
+                entry = await compute(key, arguments)
+                age = 0.0
+            elif age >= soft_ttl and entry["refresh"] is None:
+                # The background refresh must not write into this request's Response
+                background = signature.bind(*args, **kwargs)
+                background.apply_defaults()
+                for name, value in background.arguments.items():
+                    if isinstance(value, Response):
+                        background.arguments[name] = Response()
+                entry["refresh"] = asyncio.create_task(refresh(key, background))
+            
+            headers = {
+                **entry["headers"],
+                "Age": str(int(age)),
+                "Cache-Control": f"private, max-age={int(soft_ttl)}, stale-while-revalidate={int(hard_ttl - soft_ttl)}"
+            }
+            return Response(content=entry["body"], media_type="application/json", headers=headers)
+        
+        swr_endpoints.append(wrapper)
+        return wrapper
+    return register
+
+async def prewarm_swr_caches():
+    """Fill every stale-while-revalidate cache with its default request"""
+    for wrapper in swr_endpoints:
+        signature = inspect.signature(wrapper)
+        kwargs = {name: Response() for name, param in signature.parameters.items() if param.annotation is Response}
+        try:
+            await wrapper(**kwargs)
+        except Exception as e:
+            logger.error(f"Cache pre-warm of {wrapper.__name__} failed: {e}")
+
+# ============ AUDIT WRITER ============
+
+# Audit entries are queued in-process and written with one insert_many per flush.
+# Batches MongoDB does not accept in time are appended to a local JSONL spill file
+# and replayed later; entries carry their _id, so replays never duplicate a record.
+AUDIT_QUEUE_SIZE = int(os.environ.get("AUDIT_QUEUE_SIZE", "10000"))
+AUDIT_BATCH_SIZE = int(os.environ.get("AUDIT_BATCH_SIZE", "500"))
+AUDIT_FLUSH_SECONDS = float(os.environ.get("AUDIT_FLUSH_SECONDS", "0.5"))
+AUDIT_WRITE_TIMEOUT_SECONDS = float(os.environ.get("AUDIT_WRITE_TIMEOUT_SECONDS", "5"))
+AUDIT_REPLAY_SECONDS = float(os.environ.get("AUDIT_REPLAY_SECONDS", "30"))
+AUDIT_SHUTDOWN_SECONDS = float(os.environ.get("AUDIT_SHUTDOWN_SECONDS", "10"))
+AUDIT_SPILL_PATH = Path(os.environ.get("AUDIT_SPILL_PATH", str(ROOT_DIR / "audit_spill.jsonl")))
+
+class AuditWriter:
+    """Batch audit entries into MongoDB, spilling to an append-only file when it is unavailable"""
+    
+    def __init__(self, spill_path: Path):
+        self.spill_path = spill_path
+        self.replay_path = spill_path.with_name(spill_path.name + ".replay")
+        self.lock_path = spill_path.with_name(spill_path.name + ".lock")
+        self.queue: Optional[asyncio.Queue] = None
+        self.full: Optional[asyncio.Event] = None
+        self.task: Optional[asyncio.Task] = None
+        self.closing = False
+        self.next_replay = 0.0
+        self.counters = {"accepted": 0, "written": 0, "batches": 0, "spilled": 0, "replayed": 0, "failedBatches": 0}
     
-    return mongo_filter
+    @property
+    def accepting(self) -> bool:
+        return self.task is not None and not self.task.done() and not self.closing
+    
+    def start(self):
+        self.queue = asyncio.Queue(maxsize=AUDIT_QUEUE_SIZE)
+        self.full = asyncio.Event()
+        self.closing = False
+        self.task = asyncio.create_task(self.run())
+    
+    async def submit(self, entry: dict):
+        """Queue an entry; a full queue spills it rather than blocking the request"""
+        try:
+            self.queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            await self.spill([entry])
+            return
+        self.counters["accepted"] += 1
+        if self.queue.qsize() >= AUDIT_BATCH_SIZE:
+            self.full.set()
+    
+    async def run(self):
+        while not (self.closing and self.queue.empty()):
+            if time.monotonic() >= self.next_replay:
+                self.next_replay = time.monotonic() + AUDIT_REPLAY_SECONDS
+                await self.replay()
+            # Wait for a full batch or the flush interval, whichever comes first
+            try:
+                await asyncio.wait_for(self.full.wait(), AUDIT_FLUSH_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self.full.clear()
+            while not self.queue.empty():
+                batch = [self.queue.get_nowait() for _ in range(min(AUDIT_BATCH_SIZE, self.queue.qsize()))]
+                await self.flush(batch)
+    
+    async def close(self):
+        """Stop accepting entries and flush the queue; whatever cannot be written is spilled"""
+        if self.task is None:
+            return
+        self.closing = True
+        self.full.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self.task), AUDIT_SHUTDOWN_SECONDS)
+        except asyncio.TimeoutError:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+        except Exception as e:
+            logger.error(f"Audit writer error: {e}")
+        remaining = []
+        while not self.queue.empty():
+            remaining.append(self.queue.get_nowait())
+        if remaining:
+            self.append(remaining)
+        self.task = None
+    
+    async def insert(self, entries: List[dict]):
+        """insert_many that treats entries already present (same _id) as written"""
+        try:
+            await asyncio.wait_for(db.admin_audit.insert_many(entries, ordered=False), AUDIT_WRITE_TIMEOUT_SECONDS)
+        except BulkWriteError as e:
+            if e.details.get("writeConcernErrors") or any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                raise
+    
+    async def flush(self, batch: List[dict]):
+        try:
+            await self.insert(batch)
+        except asyncio.CancelledError:
+            # Shutdown gave up waiting; keep the batch on disk
+            self.append(batch)
+            raise
+        except Exception as e:
+            logger.error(f"Audit flush error, spilling {len(batch)} entries: {e!r}")
+            self.counters["failedBatches"] += 1
+            await self.spill(batch)
+            return
+        self.counters["written"] += len(batch)
+        self.counters["batches"] += 1
+        await self.bump()
+    
+    async def bump(self):
+        try:
+            await bump_cache_versions("admin_audit")
+        except Exception as e:
+            logger.error(f"Audit cache version error: {e}")
+    
+    @contextmanager
+    def locked(self):
+        """Serialize spill file access across workers (no-op without POSIX locks)"""
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, "a") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+    
+    def append(self, entries: List[dict]):
+        with self.locked():
+            with open(self.spill_path, "a", encoding="utf-8") as handle:
+                for entry in entries:
+                    handle.write(json_util.dumps(entry) + "\n")
+                handle.flush()
+                os.fsync(handle.fileno())
+        self.counters["spilled"] += len(entries)
+    
+    async def spill(self, entries: List[dict]):
+        try:
+            await asyncio.to_thread(self.append, entries)
+        except Exception as e:
+            logger.critical(f"Audit spill error, {len(entries)} entries lost: {e}")
+    
+    def claim_spill(self) -> Optional[Tuple[int, List[dict]]]:
+        """Move the spill file aside for replay and read it; (inode, entries) or None"""
+        with self.locked():
+            if not self.replay_path.exists():
+                if not self.spill_path.exists():
+                    return None
+                os.replace(self.spill_path, self.replay_path)
+            with open(self.replay_path, encoding="utf-8") as handle:
+                entries = [json_util.loads(line) for line in handle if line.strip()]
+                return os.fstat(handle.fileno()).st_ino, entries
+    
+    def release_spill(self, inode: int):
+        with self.locked():
+            try:
+                if self.replay_path.stat().st_ino == inode:
+                    self.replay_path.unlink()
+            except FileNotFoundError:
+                pass
+    
+    async def replay(self) -> int:
+        """Insert spilled entries once MongoDB accepts writes again"""
+        replayed = 0
+        try:
+            # A replay file left by an earlier attempt is retried before the current spill file
+            while (claimed := await asyncio.to_thread(self.claim_spill)) is not None:
+                inode, entries = claimed
+                for start in range(0, len(entries), AUDIT_BATCH_SIZE):
+                    await self.insert(entries[start:start + AUDIT_BATCH_SIZE])
+                await asyncio.to_thread(self.release_spill, inode)
+                replayed += len(entries)
+                self.counters["replayed"] += len(entries)
+        except Exception as e:
+            logger.warning(f"Audit replay deferred: {e!r}")
+        if replayed:
+            await self.bump()
+        return replayed
+    
+    def stats(self) -> Dict[str, Any]:
+        pending = 0
+        for path in (self.spill_path, self.replay_path):
+            try:
+                pending += path.stat().st_size
+            except FileNotFoundError:
+                pass
+        return {
+            "running": self.accepting,
+            "queued": self.queue.qsize() if self.queue else 0,
+            "capacity": AUDIT_QUEUE_SIZE,
+            "spillFile": str(self.spill_path),
+            "spillBytes": pending,
+            **self.counters
+        }
+
+audit_writer = AuditWriter(AUDIT_SPILL_PATH)
 
 # ============ API ENDPOINTS ============
 
@@ -131,94 +3251,41 @@ async def root():
 
 # Dashboard KPIs
 @api_router.get("/admin/dashboard")
-async def get_dashboard_stats():
+@stale_while_revalidate("dashboard", DASHBOARD_CACHE_SOFT_SECONDS, DASHBOARD_CACHE_HARD_SECONDS,
+                        bypass=lambda arguments: arguments.get("live"))
+async def get_dashboard_stats(response: Response, live: bool = False):
     """Get dashboard KPIs and statistics"""
     try:
-        # Total candidates
-        total_candidates = await db.users.count_documents({})
-        
-        # Total tests
-        total_tests = await db.testresults.count_documents({})
-        
-        # Verification stats (using verification field we'll add)
-        verified_count = await db.users.count_documents({"verification.status": "verified"})
-        flagged_count = await db.users.count_documents({"verification.status": "flagged"})
-        pending_count = total_candidates - verified_count - flagged_count
-        
-        # Average scores by category
-        category_pipeline = [
-            {"$group": {
-                "_id": None,
-                "avgStrength": {"$avg": "$categoryScores.strength"},
-                "avgEndurance": {"$avg": "$categoryScores.endurance"},
-                "avgFlexibility": {"$avg": "$categoryScores.flexibility"},
-                "avgAgility": {"$avg": "$categoryScores.agility"},
-                "avgSpeed": {"$avg": "$categoryScores.speed"}
-            }}
-        ]
-        category_stats = await db.users.aggregate(category_pipeline).to_list(1)
-        
-        # Tests by state
-        state_pipeline = [
-            {"$group": {
-                "_id": "$state",
-                "count": {"$sum": 1},
-                "avgXP": {"$avg": "$currentXP"}
-            }},
-            {"$sort": {"count": -1}},
-            {"$limit": 10}
-        ]
-        state_stats = await db.users.aggregate(state_pipeline).to_list(10)
-        
-        # Recent activity
-        recent_pipeline = [
-            {"$sort": {"createdAt": -1}},
-            {"$limit": 5}
-        ]
-        recent_users = await db.users.aggregate(recent_pipeline).to_list(5)
-        
-        # Test type distribution
-        test_type_pipeline = [
-            {"$group": {
-                "_id": "$testType",
-                "count": {"$sum": 1},
-                "avgScore": {"$avg": "$comparisonScore"}
-            }},
-            {"$sort": {"count": -1}}
-        ]
-        test_type_stats = await db.testresults.aggregate(test_type_pipeline).to_list(20)
+        timings = {}
+        start = time.perf_counter()
         
-        # Performance rating distribution
-        rating_pipeline = [
-            {"$group": {
-                "_id": "$performanceRating",
-                "count": {"$sum": 1}
-            }}
-        ]
-        rating_stats = await db.testresults.aggregate(rating_pipeline).to_list(10)
+        snapshot = None
+        if not live:
+            snapshot = await timed(timings, "snapshot", db.dashboard_snapshot.find_one({"_id": DASHBOARD_SNAPSHOT_ID}))
+        stats = dashboard_from_snapshot(snapshot) if snapshot else await compute_live_dashboard(timings)
+        stats["snapshot"] = snapshot_status(snapshot)
         
-        return {
-            "totalCandidates": total_candidates,
-            "totalTests": total_tests,
-            "verification": {
-                "verified": verified_count,
-                "flagged": flagged_count,
-                "pending": pending_count,
-                "verifiedRate": round(verified_count / total_candidates * 100, 1) if total_candidates > 0 else 0,
-                "flaggedRate": round(flagged_count / total_candidates * 100, 1) if total_candidates > 0 else 0
-            },
-            "categoryAverages": category_stats[0] if category_stats else {},
-            "candidatesByState": [{"state": s["_id"], "count": s["count"], "avgXP": round(s["avgXP"] or 0, 1)} for s in state_stats],
-            "testTypeDistribution": [{"testType": t["_id"], "count": t["count"], "avgScore": round(t["avgScore"] or 0, 1)} for t in test_type_stats],
-            "performanceRatings": {r["_id"]: r["count"] for r in rating_stats if r["_id"]},
-            "recentCandidates": [serialize_doc(u) for u in recent_users]
-        }
+        timings["total"] = (time.perf_counter() - start) * 1000
+        response.headers["Server-Timing"] = format_server_timing(timings)
+        return stats
     except Exception as e:
         logger.error(f"Dashboard stats error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.post("/admin/dashboard/snapshot/rebuild")
+async def rebuild_dashboard_snapshot_endpoint():
+    """Recompute the dashboard snapshot from the raw collections"""
+    try:
+        return await rebuild_dashboard_snapshot()
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"Snapshot rebuild error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Candidates List
 @api_router.get("/admin/candidates")
+@result_cached("candidates", ["users"])
 async def get_candidates(
     page: int = Query(1, ge=1),
     limit: int = Query(25, ge=1, le=100),
@@ -232,9 +3299,17 @@ async def get_candidates(
     maxXP: Optional[int] = None,
     verificationStatus: Optional[str] = None,
     search: Optional[str] = None,
-    testType: Optional[str] = None
+    testType: Optional[str] = None,
+    cursor: Optional[str] = None,
+    view: Optional[str] = None,
+    fields: Optional[str] = None
 ):
-    """Get paginated list of candidates with filters"""
+    """Get paginated list of candidates with filters.
+    
+    Pass the returned nextCursor/prevCursor as `cursor` for index range seeks;
+    `page` is used only when no cursor is given. `view` (table, card, full) or a
+    comma-separated `fields` list limits the returned fields.
+    """
     try:
         # Build filter
         filter_query = {}
@@ -266,68 +3341,85 @@ async def get_candidates(
             else:
                 filter_query["verification.status"] = verificationStatus
         if search:
-            filter_query["$or"] = [
-                {"name": {"$regex": search, "$options": "i"}},
-                {"email": {"$regex": search, "$options": "i"}},
-                {"aadhaarNumber": {"$regex": search, "$options": "i"}}
-            ]
+            search_filter = build_search_filter(search)
+            if search_filter:
+                filter_query.setdefault("$and", []).append(search_filter)
         
         # Build sort
-        sort_dict = {}
-        if sort:
-            parts = sort.split(":")
-            field = parts[0]
-            direction = -1 if len(parts) > 1 and parts[1] == "desc" else 1
-            sort_dict[field] = direction
-        else:
-            sort_dict["createdAt"] = -1
-        
-        # Get total count
-        total = await db.users.count_documents(filter_query)
+        sort_field, sort_direction = parse_sort(sort, "createdAt")
+        # Page cursors are built from the sort field, so it is always projected
+        projection = response_projection("users", view, fields, required=(sort_field,))
         
-        # Get paginated results
-        skip = (page - 1) * limit
-        cursor = db.users.find(filter_query).sort(list(sort_dict.items())).skip(skip).limit(limit)
-        candidates = await cursor.to_list(limit)
+        # Get one extra row to know whether another page follows
+        if cursor:
+            position = decode_cursor(cursor)
+            if position["f"] != sort_field or position["d"] != sort_direction:
+                raise HTTPException(status_code=400, detail="Cursor does not match sort")
+            forward = not position["b"]
+            seek = keyset_filter(sort_field, sort_direction, position["v"], position["id"], forward)
+            page_query = {"$and": [filter_query, seek]} if filter_query else seek
+            find_cursor = db.users.find(page_query, projection).sort(sort_spec(sort_field, sort_direction, forward)).limit(limit + 1)
+        else:
+            forward = True
+            skip = (page - 1) * limit
+            find_cursor = db.users.find(filter_query, projection).sort(sort_spec(sort_field, sort_direction)).skip(skip).limit(limit + 1)
+        # Total count and page fetch are independent
+        total, candidates = await fan_out(
+            lambda: db.users.count_documents(filter_query),
+            lambda: find_cursor.to_list(limit + 1)
+        )
+        has_more = len(candidates) > limit
+        candidates = candidates[:limit]
+        if not forward:
+            candidates.reverse()
         
         return {
             "total": total,
             "page": page,
             "limit": limit,
             "totalPages": (total + limit - 1) // limit,
-            "results": [serialize_doc(c) for c in candidates],
-            "appliedFilters": filter_query
+            "results": [prepare_doc(c) for c in candidates],
+            "appliedFilters": filter_query,
+            **page_cursors(candidates, sort_field, sort_direction, has_more, forward, has_previous=bool(cursor) or page > 1)
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Get candidates error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 # Single Candidate Profile
 @api_router.get("/admin/candidates/{candidate_id}")
-async def get_candidate(candidate_id: str):
-    """Get full candidate profile with test history"""
+async def get_candidate(candidate_id: str, view: Optional[str] = None, fields: Optional[str] = None):
+    """Get full candidate profile with test history.
+    
+    `view` applies to the candidate, test results and activity logs; `fields`
+    overrides it for the candidate document only.
+    """
     try:
         # Find candidate
         candidate_oid = ObjectId(candidate_id)
-        candidate = await db.users.find_one({"_id": candidate_oid})
+        candidate_projection = response_projection("users", view, fields)
+        test_projection = response_projection("testresults", view)
+        activity_projection = response_projection("activitylogs", view)
+        
+        # Candidate, test results (userId is stored as ObjectId) and activity logs
+        # (try both ObjectId and string formats) are fetched concurrently
+        candidate, test_results, activity_logs = await fan_out(
+            lambda: db.users.find_one({"_id": candidate_oid}, candidate_projection),
+            lambda: db.testresults.find({"userId": candidate_oid}, test_projection).sort("date", -1).to_list(100),
+            lambda: db.activitylogs.find(
+                {"$or": [{"userId": candidate_oid}, {"userId": candidate_id}]}, activity_projection
+            ).sort("activityDate", -1).to_list(50)
+        )
         if not candidate:
             raise HTTPException(status_code=404, detail="Candidate not found")
         
-        # Get test results for this candidate (userId is stored as ObjectId)
-        test_results = await db.testresults.find(
-            {"userId": candidate_oid}
-        ).sort("date", -1).to_list(100)
-        
-        # Get activity logs (try both ObjectId and string formats)
-        activity_logs = await db.activitylogs.find(
-            {"$or": [{"userId": candidate_oid}, {"userId": candidate_id}]}
-        ).sort("activityDate", -1).to_list(50)
-        
-        return {
-            "candidate": serialize_doc(candidate),
-            "testResults": [serialize_doc(t) for t in test_results],
-            "activityLogs": [serialize_doc(a) for a in activity_logs]
-        }
+        return FastJSONResponse({
+            "candidate": prepare_doc(candidate),
+            "testResults": [prepare_doc(t) for t in test_results],
+            "activityLogs": [prepare_doc(a) for a in activity_logs]
+        })
     except HTTPException:
         raise
     except Exception as e:
@@ -336,6 +3428,7 @@ async def get_candidate(candidate_id: str):
 
 # Test Results
 @api_router.get("/admin/test-results")
+@result_cached("test-results", ["testresults", "users"])
 async def get_test_results(
     page: int = Query(1, ge=1),
     limit: int = Query(25, ge=1, le=100),
@@ -351,9 +3444,14 @@ async def get_test_results(
     startDate: Optional[str] = None,
     endDate: Optional[str] = None,
     userId: Optional[str] = None,
-    search: Optional[str] = None
+    search: Optional[str] = None,
+    view: Optional[str] = None,
+    fields: Optional[str] = None
 ):
-    """Get paginated test results with filters and user names"""
+    """Get paginated test results with filters and user names.
+    
+    `view` (table, card, full) or a comma-separated `fields` list limits the returned fields.
+    """
     try:
         filter_query = {}
         
@@ -394,31 +3492,47 @@ async def get_test_results(
         else:
             sort_dict["date"] = -1
         
-        total = await db.testresults.count_documents(filter_query)
-        skip = (page - 1) * limit
-        cursor = db.testresults.find(filter_query).sort(list(sort_dict.items())).skip(skip).limit(limit)
-        results = await cursor.to_list(limit)
+        # userId is always projected for the user name enrichment
+        projection = response_projection("testresults", view, fields, required=("userId",))
         
-        # Fetch user names for each test result
-        user_ids = list(set([r.get("userId") for r in results if r.get("userId")]))
-        user_map = {}
+        # Name search: resolve matching users first, then constrain userId
+        page_query = filter_query
+        name_user_ids = await find_user_ids_by_search(search) if search else []
+        skip = (page - 1) * limit
+        if name_user_ids is None:
+            # Too many matching users for $in: join them in sort order instead
+            page_stages = [{"$skip": skip}, {"$limit": limit}] + ([{"$project": projection}] if projection else [])
+            pipeline = [{"$match": filter_query}, {"$sort": sort_dict}] + search_join_stages(search) + [
+                {"$facet": {"total": [{"$count": "n"}], "results": page_stages}}
+            ]
+            facet = (await db.testresults.aggregate(pipeline, allowDiskUse=True).to_list(1))[0]
+            total = facet["total"][0]["n"] if facet["total"] else 0
+            results = facet["results"]
+        else:
+            if search and not name_user_ids:
+                return {
+                    "total": 0,
+                    "page": page,
+                    "limit": limit,
+                    "totalPages": 0,
+                    "results": [],
+                    "appliedFilters": filter_query
+                }
+            if search:
+                page_query = {"$and": [filter_query, {"userId": {"$in": name_user_ids}}]} if filter_query else {"userId": {"$in": name_user_ids}}
+            cursor = db.testresults.find(page_query, projection).sort(list(sort_dict.items())).skip(skip).limit(limit)
+            total, results = await fan_out(
+                lambda: db.testresults.count_documents(page_query),
+                lambda: cursor.to_list(limit)
+            )
         
-        for uid in user_ids:
-            try:
-                user = await db.users.find_one({"_id": ObjectId(uid)})
-                if user:
-                    user_map[str(uid)] = {
-                        "name": user.get("name", "Unknown"),
-                        "state": user.get("state", ""),
-                        "city": user.get("city", "")
-                    }
-            except:
-                pass
+        # Fetch user names for the whole page in one query
+        user_map = await fetch_user_map([r.get("userId") for r in results if r.get("userId")])
         
         # Add user info to results
         enriched_results = []
         for r in results:
-            doc = serialize_doc(r)
+            doc = prepare_doc(r)
             uid = str(r.get("userId", ""))
             if uid in user_map:
                 doc["userName"] = user_map[uid]["name"]
@@ -430,12 +3544,6 @@ async def get_test_results(
                 doc["userCity"] = ""
             enriched_results.append(doc)
         
-        # Filter by search (name) if provided - post-filter since we enriched
-        if search:
-            search_lower = search.lower()
-            enriched_results = [r for r in enriched_results if search_lower in r.get("userName", "").lower()]
-            total = len(enriched_results)
-        
         return {
             "total": total,
             "page": page,
@@ -444,12 +3552,15 @@ async def get_test_results(
             "results": enriched_results,
             "appliedFilters": filter_query
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Get test results error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 # Advanced Query
 @api_router.post("/admin/query")
+@result_cached("query", ["users", "testresults"])
 async def execute_query(query: QueryFilter):
     """Execute complex queries with grouping and aggregation"""
     try:
@@ -503,61 +3614,40 @@ async def execute_query(query: QueryFilter):
         
         logger.info(f"Extracted test filters: {test_filters}")
         
-        # If test filters exist, get user IDs from testresults first
-        # Each test filter is independent (different test types can be combined with AND)
-        all_user_id_sets = []
-        enrichment_test_names = []  # Track which tests to enrich results with
+        # Grouped queries are answered from the columnar snapshot when it is warm
+        if query.groupBy:
+            groups = columnar_group(build_mongo_filter(filters_copy), test_filters, query.groupBy, query.aggregate)
+            if groups is not None:
+                skip = (query.page - 1) * query.limit
+                return {
+                    "total": len(groups),
+                    "page": query.page,
+                    "limit": query.limit,
+                    "totalPages": (len(groups) + query.limit - 1) // query.limit,
+                    "results": [prepare_doc(g) for g in groups[skip:skip + query.limit]],
+                    "grouped": True,
+                    "testFilters": [{"testName": tf["testName"], "metric": tf["metric"]} for tf in test_filters]
+                }
         
+        # If test filters exist, the pipeline starts on testresults: users matching
+        # every clause are found server-side and joined back to their user documents
+        enrichment_test_names = [tf["testName"] for tf in test_filters]  # Track which tests to enrich results with
+        # A warm bitmap index resolves the clauses to user ids in-process; otherwise the
+        # per-user summary answers one-sided metric bounds without touching testresults
+        base_collection = db.users
         if test_filters:
-            for tf in test_filters:
-                test_name = tf["testName"]
-                metric = tf["metric"]
-                condition = tf["condition"]
-                
-                # Build query for this test filter
-                test_query = {"testName": test_name}
-                if isinstance(condition, dict):
-                    test_query[metric] = condition
+            bitmap = warm_bitmap_index()
+            bitmap_user_ids = bitmap.match(test_filters) if bitmap else None
+            if bitmap_user_ids is not None and len(bitmap_user_ids) <= BITMAP_MAX_MATCHES:
+                pipeline.append({"$match": {"_id": {"$in": bitmap_user_ids}}})
+            else:
+                summary_stages = summary_filter_stages(test_filters) if await user_test_summary_ready() else None
+                if summary_stages:
+                    base_collection = db.user_test_summary
+                    pipeline.extend(summary_stages)
                 else:
-                    test_query[metric] = condition
-                
-                logger.info(f"Test query for {test_name}.{metric}: {test_query}")
-                test_cursor = db.testresults.find(test_query, {"userId": 1})
-                test_results = await test_cursor.to_list(10000)
-                
-                # Get unique user IDs for this filter
-                user_id_set = set()
-                for r in test_results:
-                    uid = r.get("userId")
-                    if uid:
-                        user_id_set.add(str(uid))
-                
-                all_user_id_sets.append(user_id_set)
-                enrichment_test_names.append(test_name)
-                logger.info(f"Found {len(user_id_set)} users for {test_name}.{metric}")
-            
-            # Intersect all user ID sets (AND logic - user must match ALL test filters)
-            if all_user_id_sets:
-                final_user_ids_str = set.intersection(*all_user_id_sets)
-                
-                if not final_user_ids_str:
-                    # No users match all criteria
-                    return {
-                        "total": 0,
-                        "page": query.page,
-                        "limit": query.limit,
-                        "totalPages": 0,
-                        "results": [],
-                        "grouped": len(query.groupBy) > 0,
-                        "testFilters": [{"testName": tf["testName"], "metric": tf["metric"]} for tf in test_filters]
-                    }
-                
-                # Convert string IDs back to ObjectId for MongoDB query
-                from bson import ObjectId
-                user_ids = [ObjectId(uid) for uid in final_user_ids_str]
-                
-                # Add user ID filter to pipeline
-                pipeline.append({"$match": {"_id": {"$in": user_ids}}})
+                    base_collection = db.testresults
+                    pipeline.extend(test_filter_stages(test_filters))
         
         # Match stage for other filters
         if filters_copy:
@@ -595,45 +3685,59 @@ async def execute_query(query: QueryFilter):
             
             pipeline.append({"$group": group_stage})
             pipeline.append({"$sort": {"count": -1}})
-        else:
-            # Sort stage (for non-grouped queries)
-            # Skip sort for test metric fields - they'll be sorted after enrichment
-            test_metric_fields = ["timeTaken", "speed", "distance"]
-            if query.sort:
-                sort_dict = {}
-                for s in query.sort:
-                    sort_field = s.get("field", "_id")
-                    # Check if it's a testFilter field (testFilter.TestName.metric)
-                    is_test_metric_sort = False
-                    if sort_field.startswith("testFilter."):
-                        is_test_metric_sort = True
-                    elif sort_field in test_metric_fields:
-                        is_test_metric_sort = True
-                    
-                    # Skip test metric fields in MongoDB sort - will sort after enrichment
-                    if not is_test_metric_sort:
-                        direction = -1 if s.get("dir") == "desc" else 1
-                        sort_dict[sort_field] = direction
-                if sort_dict:
-                    pipeline.append({"$sort": sort_dict})
+        
+        # Sort stage (for non-grouped queries); test metric sorts resolve each
+        # user's best result with a $lookup so ordering happens before pagination
+        sort_stages = []
+        metric_aliases = []
+        metric_sorts = {}  # testName -> (metric, direction, alias) of the first sort on that test
+        if not query.groupBy and query.sort:
+            sort_dict = {}
+            for s in query.sort:
+                sort_field = s.get("field", "_id")
+                direction = -1 if s.get("dir") == "desc" else 1
+                if sort_field.startswith("testFilter.") or sort_field in TEST_METRIC_FIELDS:
+                    metric_sort = parse_test_metric_sort(sort_field, enrichment_test_names)
+                    if metric_sort:
+                        alias = f"_sortMetric{len(metric_aliases)}"
+                        sort_stages.extend(test_metric_sort_stages(metric_sort[0], metric_sort[1], direction, alias))
+                        sort_dict[f"{alias}Missing"] = 1
+                        sort_dict[alias] = direction
+                        metric_aliases.append(alias)
+                        metric_sorts.setdefault(metric_sort[0], (metric_sort[1], direction, alias))
+                else:
+                    sort_dict[sort_field] = direction
+            if sort_dict:
+                sort_dict.setdefault("_id", 1)
+                sort_stages.append({"$sort": sort_dict})
         
         # Pagination
         skip = (query.page - 1) * query.limit
         
-        # Count total before pagination
+        # Count total before sorting and pagination
         count_pipeline = pipeline.copy()
         count_pipeline.append({"$count": "total"})
-        count_result = await db.users.aggregate(count_pipeline).to_list(1)
-        total = count_result[0]["total"] if count_result else 0
         
-        # Add pagination
+        # Add sorting and pagination
+        pipeline.extend(sort_stages)
         pipeline.append({"$skip": skip})
         pipeline.append({"$limit": query.limit})
+        # Only the paginated page of user documents is projected; sort values are kept so
+        # enrichment shows the result each row was ordered by
+        projection = None if query.groupBy else response_projection("users", query.view, query.fields)
+        if projection:
+            pipeline.append({"$project": {**projection, **{alias: 1 for alias in metric_aliases}}})
+        elif metric_aliases:
+            pipeline.append({"$project": {f"{alias}Missing": 0 for alias in metric_aliases}})
         
-        results = await db.users.aggregate(pipeline).to_list(query.limit)
+        count_result, results = await fan_out(
+            lambda: base_collection.aggregate(count_pipeline, allowDiskUse=True).to_list(1),
+            lambda: base_collection.aggregate(pipeline, allowDiskUse=True).to_list(query.limit)
+        )
+        total = count_result[0]["total"] if count_result else 0
         
         # If filtering by test metrics, enrich results with test data
-        serialized_results = [serialize_doc(r) for r in results]
+        serialized_results = [prepare_doc(r) for r in results]
         
         # Check if we need enrichment - either for test filters OR for sorting by test metrics
         sort_test_name = None
@@ -651,10 +3755,12 @@ async def execute_query(query: QueryFilter):
         needs_enrichment = test_filters or sort_test_name
         if needs_enrichment:
             # Fetch test results for these users for each test type in filters
+            # Test results may store userId as an ObjectId or its string form
             user_ids_for_metrics = [r["_id"] for r in results]
+            user_ids_for_metrics += [str(uid) for uid in user_ids_for_metrics]
             
             # Build OR query for all test types we want to enrich with
-            unique_test_names = list(set(enrichment_test_names))
+            unique_test_names = list(dict.fromkeys(enrichment_test_names))
             
             test_metrics_query = {
                 "userId": {"$in": user_ids_for_metrics},
@@ -664,9 +3770,11 @@ async def execute_query(query: QueryFilter):
             # Explicitly fetch all fields we need
             projection = {
                 "userId": 1, "testName": 1, "timeTaken": 1, "speed": 1, 
-                "distance": 1, "comparisonScore": 1, "performanceRating": 1, "date": 1
+                "distance": 1, "comparisonScore": 1, "performanceRating": 1, "date": 1,
+                **{metric: 1 for metric, _, _ in metric_sorts.values()}
             }
-            test_metrics_cursor = db.testresults.find(test_metrics_query, projection)
+            # Oldest first so the latest result wins, except for tests the page is sorted by
+            test_metrics_cursor = db.testresults.find(test_metrics_query, projection).sort("date", 1)
             test_metrics_data = await test_metrics_cursor.to_list(len(user_ids_for_metrics) * len(unique_test_names) * 2)
             
             # Create lookup: userId -> {testName -> test data}
@@ -678,8 +3786,7 @@ async def execute_query(query: QueryFilter):
                 if uid_str not in user_test_map:
                     user_test_map[uid_str] = {}
                 
-                # Store data by test name
-                user_test_map[uid_str][test_name] = {
+                entry = {
                     "testName": test_name,
                     "timeTaken": tm.get("timeTaken"),
                     "speed": tm.get("speed"),
@@ -688,10 +3795,25 @@ async def execute_query(query: QueryFilter):
                     "performanceRating": tm.get("performanceRating"),
                     "date": tm.get("date")
                 }
+                # A sorted test keeps the result holding the best value, the same
+                # $max/$min test_metric_sort_stages ordered the page by
+                held = user_test_map[uid_str].get(test_name)
+                if test_name in metric_sorts:
+                    metric, direction, _ = metric_sorts[test_name]
+                    entry[metric] = tm.get(metric)
+                    if held is not None and not is_better_metric(entry[metric], held.get(metric), direction):
+                        continue
+                
+                # Store data by test name
+                user_test_map[uid_str][test_name] = entry
             
             # Enrich user results with test metrics for each test
             for user in serialized_results:
                 user_id = user.get("id", "")
+                for test_name, (metric, _, alias) in metric_sorts.items():
+                    entry = user_test_map.get(user_id, {}).get(test_name)
+                    if entry is not None and alias in user:
+                        entry[metric] = user[alias]
                 if user_id in user_test_map:
                     user_tests = user_test_map[user_id]
                     user["testMetrics"] = user_tests
@@ -704,35 +3826,12 @@ async def execute_query(query: QueryFilter):
                         user["speed"] = first_test.get("speed")
                         user["distance"] = first_test.get("distance")
                         user["performanceRating"] = first_test.get("performanceRating")
-            
-            # Sort by test metrics if needed (these fields only exist after enrichment)
-            test_metric_fields = ["timeTaken", "speed", "distance"]
-            if query.sort:
-                for s in query.sort:
-                    sort_field = s.get("field")
-                    sort_dir = s.get("dir", "asc")
-                    reverse = sort_dir == "desc"
-                    
-                    # Check if it's a testFilter field (testFilter.TestName.metric)
-                    if sort_field and sort_field.startswith("testFilter."):
-                        parts = sort_field.split(".", 2)
-                        if len(parts) == 3:
-                            test_name = parts[1]
-                            metric = parts[2]
-                            # Sort using the nested testMetrics structure
-                            serialized_results.sort(
-                                key=lambda x, tn=test_name, m=metric: (x.get("testMetrics") or {}).get(tn, {}).get(m) or 0,
-                                reverse=reverse
-                            )
-                            break
-                    elif sort_field in test_metric_fields:
-                        # Flat metric field (backward compatibility)
-                        serialized_results.sort(
-                            key=lambda x, sf=sort_field: x.get(sf) or 0,
-                            reverse=reverse
-                        )
-                        break
         
+        # Sort values were only kept to align the enrichment with the page order
+        for user in serialized_results:
+            for alias in metric_aliases:
+                user.pop(alias, None)
+
         return {
             "total": total,
             "page": query.page,
@@ -742,25 +3841,139 @@ async def execute_query(query: QueryFilter):
             "grouped": len(query.groupBy) > 0,
             "testFilters": [{"testName": tf["testName"], "metric": tf["metric"]} for tf in test_filters] if test_filters else []
         }
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         logger.error(f"Execute query error: {e}")
         logger.error(f"Traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.post("/admin/test-summary/rebuild")
+async def rebuild_user_test_summary_endpoint():
+    """Recompute the per-user test summary collection from testresults"""
+    try:
+        return await rebuild_user_test_summary()
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"Test summary rebuild error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Verification Actions
-@api_router.patch("/admin/candidates/{candidate_id}/verify")
-async def verify_candidate(candidate_id: str, action: VerificationAction):
-    """Update candidate verification status"""
+def verification_update(new_status: dict) -> List[dict]:
+    """Update pipeline that replaces verification and bumps verification.version"""
+    # An expression (not a document) so $set replaces the subdocument instead of merging;
+    # $literal keeps admin-supplied strings such as the note from being read as field paths
+    version = {"$add": [{"$ifNull": ["$verification.version", 0]}, 1]}
+    return [{"$set": {"verification": {"$mergeObjects": [{"$literal": new_status}, {"version": version}]}}}]
+
+def verification_version_filter(version: int) -> dict:
+    """Match candidates whose verification.version equals version (unversioned counts as 0)"""
+    return {"verification.version": {"$in": [0, None]} if version == 0 else version}
+
+@api_router.patch("/admin/candidates/verify-bulk")
+async def verify_candidates_bulk(action: BulkVerificationAction):
+    """Apply one verification action to many candidates with a single bulk write.
+    
+    Each update is conditional on the verification.version read with the before-states;
+    candidates changed (or deleted) in between are reported as conflicts and left alone.
+    """
     try:
-        # Get current state
-        candidate = await db.users.find_one({"_id": ObjectId(candidate_id)})
-        if not candidate:
-            raise HTTPException(status_code=404, detail="Candidate not found")
+        candidate_ids = list(dict.fromkeys(action.candidateIds))
+        oids = {cid: ObjectId(cid) for cid in candidate_ids if ObjectId.is_valid(cid)}
         
-        before_state = candidate.get("verification", {})
+        # Before-states for the whole batch in one query
+        candidates = await db.users.find(
+            {"_id": {"$in": list(oids.values())}}, {"verification": 1}
+        ).to_list(len(oids))
+        before_states = {str(c["_id"]): c.get("verification") or {} for c in candidates}
+        
+        new_status = {
+            "status": action.action,
+            "adminId": action.adminId,
+            "note": action.note,
+            "updatedAt": datetime.now(timezone.utc).isoformat()
+        }
+        found_ids = [cid for cid in candidate_ids if cid in before_states]
+        after_states = {cid: {**new_status, "version": (before_states[cid].get("version") or 0) + 1} for cid in found_ids}
+        updated_ids = found_ids
+        if found_ids:
+            result = await db.users.bulk_write(
+                [
+                    UpdateOne(
+                        {"_id": oids[cid], **verification_version_filter(before_states[cid].get("version") or 0)},
+                        verification_update(new_status)
+                    )
+                    for cid in found_ids
+                ],
+                ordered=False
+            )
+            if result.matched_count < len(found_ids):
+                # The bulk result has no per-operation matches: an update applied
+                # iff the candidate now carries this request's version and timestamp
+                current = await db.users.find(
+                    {"_id": {"$in": [oids[cid] for cid in found_ids]}},
+                    {"verification.version": 1, "verification.updatedAt": 1}
+                ).to_list(len(found_ids))
+                applied = {
+                    str(c["_id"]) for c in current
+                    if (c.get("verification") or {}).get("updatedAt") == new_status["updatedAt"]
+                    and (c.get("verification") or {}).get("version") == after_states[str(c["_id"])]["version"]
+                }
+                updated_ids = [cid for cid in found_ids if cid in applied]
+        if updated_ids:
+            await fan_out(
+                lambda: apply_verification_changes_to_snapshot(
+                    [(before_states[cid].get("status"), new_status["status"]) for cid in updated_ids]
+                ),
+                lambda: bump_cache_versions("users"),
+                lambda: log_audit_many([
+                    audit_entry(
+                        admin_id=action.adminId,
+                        action=f"verification_{action.action}",
+                        target_id=cid,
+                        target_type="candidate",
+                        before=before_states[cid],
+                        after=after_states[cid],
+                        note=action.note
+                    )
+                    for cid in updated_ids
+                ])
+            )
+        
+        results = []
+        updated = set(updated_ids)
+        for cid in candidate_ids:
+            if cid not in oids:
+                results.append({"candidateId": cid, "success": False, "error": "Invalid candidate id"})
+            elif cid not in before_states:
+                results.append({"candidateId": cid, "success": False, "error": "Candidate not found"})
+            elif cid not in updated:
+                results.append({"candidateId": cid, "success": False, "conflict": True, "error": "Verification changed concurrently"})
+            else:
+                results.append({"candidateId": cid, "success": True, "verification": after_states[cid]})
         
-        # Update verification status
+        return {
+            "success": len(updated_ids) == len(candidate_ids),
+            "updated": len(updated_ids),
+            "conflicts": len(found_ids) - len(updated_ids),
+            "failed": len(candidate_ids) - len(updated_ids),
+            "results": results
+        }
+    except Exception as e:
+        logger.error(f"Bulk verify error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.patch("/admin/candidates/{candidate_id}/verify")
+async def verify_candidate(candidate_id: str, action: VerificationAction):
+    """Update candidate verification status.
+    
+    The before-state is captured by the same atomic update. With expectedVersion
+    the update only applies while verification.version still matches (409 otherwise).
+    """
+    try:
+        candidate_oid = ObjectId(candidate_id)
         new_status = {
             "status": action.action,
             "adminId": action.adminId,
@@ -768,20 +3981,41 @@ async def verify_candidate(candidate_id: str, action: VerificationAction):
             "updatedAt": datetime.now(timezone.utc).isoformat()
         }
         
-        await db.users.update_one(
-            {"_id": ObjectId(candidate_id)},
-            {"$set": {"verification": new_status}}
+        update_filter = {"_id": candidate_oid}
+        if action.expectedVersion is not None:
+            update_filter.update(verification_version_filter(action.expectedVersion))
+        candidate = await db.users.find_one_and_update(
+            update_filter,
+            verification_update(new_status),
+            projection={"verification": 1},
+            return_document=ReturnDocument.BEFORE
         )
+        if not candidate:
+            # Only a failed version check needs the extra read to tell 409 from 404
+            current = await db.users.find_one({"_id": candidate_oid}, {"verification.version": 1}) if action.expectedVersion is not None else None
+            if not current:
+                raise HTTPException(status_code=404, detail="Candidate not found")
+            raise HTTPException(
+                status_code=409,
+                detail=f"Verification changed concurrently: expected version {action.expectedVersion}, found {(current.get('verification') or {}).get('version') or 0}"
+            )
+        
+        before_state = candidate.get("verification", {})
+        new_status["version"] = ((before_state or {}).get("version") or 0) + 1
         
-        # Log audit
-        await log_audit(
-            admin_id=action.adminId,
-            action=f"verification_{action.action}",
-            target_id=candidate_id,
-            target_type="candidate",
-            before=before_state,
-            after=new_status,
-            note=action.note
+        # Snapshot counters, cache versions and the audit entry are independent writes
+        await fan_out(
+            lambda: apply_verification_to_snapshot((before_state or {}).get("status"), new_status["status"]),
+            lambda: bump_cache_versions("users"),
+            lambda: log_audit(
+                admin_id=action.adminId,
+                action=f"verification_{action.action}",
+                target_id=candidate_id,
+                target_type="candidate",
+                before=before_state,
+                after=new_status,
+                note=action.note
+            )
         )
         
         return {
@@ -797,6 +4031,7 @@ async def verify_candidate(candidate_id: str, action: VerificationAction):
 
 # Audit Logs
 @api_router.get("/admin/audit")
+@result_cached("audit", ["admin_audit"])
 async def get_audit_logs(
     page: int = Query(1, ge=1),
     limit: int = Query(25, ge=1, le=100),
@@ -823,17 +4058,19 @@ async def get_audit_logs(
             if endDate:
                 filter_query["timestamp"]["$lte"] = endDate
         
-        total = await db.admin_audit.count_documents(filter_query)
         skip = (page - 1) * limit
         cursor = db.admin_audit.find(filter_query).sort("timestamp", -1).skip(skip).limit(limit)
-        logs = await cursor.to_list(limit)
+        total, logs = await fan_out(
+            lambda: db.admin_audit.count_documents(filter_query),
+            lambda: cursor.to_list(limit)
+        )
         
         return {
             "total": total,
             "page": page,
             "limit": limit,
             "totalPages": (total + limit - 1) // limit,
-            "results": [serialize_doc(log) for log in logs]
+            "results": [prepare_doc(log) for log in logs]
         }
     except Exception as e:
         logger.error(f"Get audit logs error: {e}")
@@ -845,7 +4082,7 @@ async def get_candidate_audit(candidate_id: str):
     try:
         cursor = db.admin_audit.find({"targetId": candidate_id}).sort("timestamp", -1)
         logs = await cursor.to_list(100)
-        return {"logs": [serialize_doc(log) for log in logs]}
+        return FastJSONResponse({"logs": [prepare_doc(log) for log in logs]})
     except Exception as e:
         logger.error(f"Get candidate audit error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -853,110 +4090,133 @@ async def get_candidate_audit(candidate_id: str):
 # Export
 @api_router.get("/admin/export")
 async def export_data(
-    format: str = Query("json", enum=["json", "csv"]),
+    format: str = Query("json", enum=list(EXPORT_FORMATS)),
     type: str = Query("candidates", enum=["candidates", "test-results"]),
     state: Optional[str] = None,
     gender: Optional[str] = None,
     verificationStatus: Optional[str] = None,
     testType: Optional[str] = None,
-    limit: int = Query(1000, ge=1, le=10000)
+    limit: Optional[int] = Query(None, ge=1),
+    compress: Optional[str] = Query(None, enum=["gzip"])
 ):
-    """Export data as CSV or JSON"""
+    """Stream data as CSV, JSON, NDJSON, Parquet or Arrow IPC, optionally gzip-compressed"""
     try:
-        filter_query = {}
+        collection, filter_query = build_export_query(type, state, gender, verificationStatus, testType)
+        stats = {"rows": 0}
+        chunks = export_chunks(format, type, collection, filter_query, limit, stats)
+        chunks = audit_export(chunks, stats, type, format)
         
-        if type == "candidates":
-            collection = db.users
-            if state:
-                filter_query["state"] = state
-            if gender:
-                filter_query["gender"] = gender
-            if verificationStatus:
-                filter_query["verification.status"] = verificationStatus
-        else:
-            collection = db.testresults
-            if testType:
-                filter_query["testType"] = testType
-            if gender:
-                filter_query["gender"] = gender
+        media_type = EXPORT_FORMATS[format]["mediaType"]
+        filename = f"sai_export_{type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{EXPORT_FORMATS[format]['extension']}"
+        headers = {}
+        if compress == "gzip":
+            chunks = gzip_chunks(chunks)
+            media_type = "application/gzip"
+            filename += ".gz"
+        if format != "json" or compress:
+            headers["Content-Disposition"] = f"attachment; filename={filename}"
         
-        cursor = collection.find(filter_query).limit(limit)
-        data = await cursor.to_list(limit)
-        serialized_data = [serialize_doc(d) for d in data]
+        return StreamingResponse(chunks, media_type=media_type, headers=headers)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Export error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.post("/admin/export/jobs", status_code=202)
+async def create_export_job(request: ExportJobRequest):
+    """Queue a background export spooled to a compressed file"""
+    try:
+        if request.format not in EXPORT_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Unsupported export format: {request.format}")
+        if request.format in COLUMNAR_EXPORT_FORMATS and pa is None:
+            raise HTTPException(status_code=501, detail="Parquet and Arrow exports require pyarrow")
+        if request.type not in ("candidates", "test-results"):
+            raise HTTPException(status_code=400, detail=f"Unsupported export type: {request.type}")
         
-        # Log export action
-        await log_audit(
-            admin_id="SAI_ADMIN_001",
-            action="export",
-            target_id="bulk",
-            target_type=type,
-            note=f"Exported {len(serialized_data)} {type} records as {format}"
-        )
+        job_id = str(uuid.uuid4())
+        job = {
+            "_id": job_id,
+            "status": "queued",
+            "params": request.model_dump(exclude={"adminId"}),
+            "adminId": request.adminId,
+            "filename": export_job_filename(request.type, request.format, job_id),
+            "worker": WORKER_ID,
+            "rowsWritten": 0,
+            "bytesWritten": 0,
+            "createdAt": datetime.now(timezone.utc),
+            "heartbeatAt": datetime.now(timezone.utc)
+        }
+        await db.export_jobs.insert_one(job)
+        start_export_job(job_id)
+        return export_job_view(job)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Create export job error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/admin/export/jobs/{job_id}")
+async def get_export_job(job_id: str):
+    """Export job status and progress"""
+    try:
+        job = await db.export_jobs.find_one({"_id": job_id})
+        if not job:
+            raise HTTPException(status_code=404, detail="Export job not found")
+        return export_job_view(job)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get export job error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/admin/export/jobs/{job_id}/download")
+async def download_export_job(job_id: str, range_header: Optional[str] = Header(None, alias="Range")):
+    """Download a finished export, honouring HTTP Range requests"""
+    try:
+        job = await db.export_jobs.find_one({"_id": job_id})
+        if not job:
+            raise HTTPException(status_code=404, detail="Export job not found")
+        if job["status"] == "expired":
+            raise HTTPException(status_code=410, detail="Export file is no longer available")
+        if job["status"] != "completed":
+            raise HTTPException(status_code=409, detail=f"Export job is {job['status']}")
+        path = EXPORT_DIR / job["filename"]
+        if not path.exists():
+            raise HTTPException(status_code=410, detail="Export file is no longer available")
         
-        if format == "csv":
-            if not serialized_data:
-                return Response(content="No data", media_type="text/csv")
-            
-            output = io.StringIO()
-            
-            # Flatten nested objects for CSV
-            flat_data = []
-            for item in serialized_data:
-                flat_item = {}
-                for key, value in item.items():
-                    if isinstance(value, dict):
-                        for k, v in value.items():
-                            flat_item[f"{key}_{k}"] = v
-                    elif isinstance(value, list):
-                        flat_item[key] = str(value)[:200]  # Truncate arrays
-                    else:
-                        flat_item[key] = value
-                flat_data.append(flat_item)
-            
-            # Get all possible headers
-            headers = set()
-            for item in flat_data:
-                headers.update(item.keys())
-            headers = sorted(list(headers))
-            
-            writer = csv.DictWriter(output, fieldnames=headers, extrasaction='ignore')
-            writer.writeheader()
-            writer.writerows(flat_data)
-            
-            csv_content = output.getvalue()
-            
-            return Response(
-                content=csv_content,
-                media_type="text/csv",
-                headers={"Content-Disposition": f"attachment; filename=sai_export_{type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"}
-            )
+        size = path.stat().st_size
+        headers = {
+            "Accept-Ranges": "bytes",
+            "Content-Disposition": f"attachment; filename={job['filename']}"
+        }
+        if range_header:
+            start, end = parse_byte_range(range_header, size)
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            status_code = 206
         else:
-            return {
-                "type": type,
-                "count": len(serialized_data),
-                "exportedAt": datetime.now(timezone.utc).isoformat(),
-                "data": serialized_data
-            }
+            start, end = 0, size - 1
+            status_code = 200
+        headers["Content-Length"] = str(end - start + 1)
+        media_type = "application/gzip" if job["filename"].endswith(".gz") else EXPORT_FORMATS[job["params"]["format"]]["mediaType"]
+        return StreamingResponse(iter_file_range(path, start, end), status_code=status_code, media_type=media_type, headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Export error: {e}")
+        logger.error(f"Download export job error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 # Filter Options (for dropdown population)
 @api_router.get("/admin/filter-options")
+@stale_while_revalidate("filter-options", FILTER_OPTIONS_CACHE_SOFT_SECONDS, FILTER_OPTIONS_CACHE_HARD_SECONDS)
 async def get_filter_options():
-    """Get available filter options from database"""
+    """Get available filter options from the filter catalog"""
     try:
-        # Get distinct values
-        states = await db.users.distinct("state")
-        cities = await db.users.distinct("city")
-        genders = await db.users.distinct("gender")
-        test_types = await db.testresults.distinct("testType")
-        categories = await db.testresults.distinct("category")
-        age_groups = await db.testresults.distinct("ageGroup")
-        performance_ratings = await db.testresults.distinct("performanceRating")
-        test_names = await db.testresults.distinct("testName")
+        entries = await db.filter_catalog.find({}).to_list(None)
+        if entries:
+            return filter_options_from_catalog(entries)
         
-        # Age range
+        # Catalog not reconciled yet: scan the collections directly
         age_pipeline = [
             {"$group": {
                 "_id": None,
@@ -964,9 +4224,6 @@ async def get_filter_options():
                 "maxAge": {"$max": "$age"}
             }}
         ]
-        age_range = await db.users.aggregate(age_pipeline).to_list(1)
-        
-        # Score range
         score_pipeline = [
             {"$group": {
                 "_id": None,
@@ -974,7 +4231,19 @@ async def get_filter_options():
                 "maxScore": {"$max": "$comparisonScore"}
             }}
         ]
-        score_range = await db.testresults.aggregate(score_pipeline).to_list(1)
+        (states, cities, genders, test_types, categories, age_groups,
+         performance_ratings, test_names, age_range, score_range) = await fan_out(
+            lambda: db.users.distinct("state"),
+            lambda: db.users.distinct("city"),
+            lambda: db.users.distinct("gender"),
+            lambda: db.testresults.distinct("testType"),
+            lambda: db.testresults.distinct("category"),
+            lambda: db.testresults.distinct("ageGroup"),
+            lambda: db.testresults.distinct("performanceRating"),
+            lambda: db.testresults.distinct("testName"),
+            lambda: db.users.aggregate(age_pipeline).to_list(1),
+            lambda: db.testresults.aggregate(score_pipeline).to_list(1)
+        )
         
         return {
             "states": sorted([s for s in states if s]),
@@ -992,6 +4261,70 @@ async def get_filter_options():
         logger.error(f"Filter options error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.post("/admin/filter-options/reconcile")
+async def reconcile_filter_catalog_endpoint():
+    """Recompute the filter catalog from the raw collections"""
+    try:
+        return await reconcile_filter_catalog()
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"Filter catalog reconcile error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Index health
+@api_router.get("/admin/indexes")
+async def get_index_report():
+    """Report missing and unused indexes and query plans for endpoint filters"""
+    try:
+        return await index_report()
+    except Exception as e:
+        logger.error(f"Index report error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Bitmap index status
+@api_router.get("/admin/bitmap-index")
+async def get_bitmap_index_status():
+    """Report bitmap index freshness and memory usage"""
+    return bitmap_status()
+
+@api_router.post("/admin/bitmap-index/refresh")
+async def refresh_bitmap_index_endpoint():
+    """Rebuild the in-process bitmap index now"""
+    try:
+        await refresh_test_bitmap_index()
+        return bitmap_status()
+    except Exception as e:
+        logger.error(f"Bitmap index refresh error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Columnar analytics status
+@api_router.get("/admin/analytics")
+async def get_analytics_status():
+    """Report columnar analytics snapshot freshness and memory usage"""
+    return analytics_status()
+
+# Result cache stats
+@api_router.get("/admin/cache")
+async def get_cache_stats():
+    """Report result cache hit/miss counters, size and collection versions"""
+    try:
+        return {**result_cache.stats(), "versions": await cache_versions(["users", "testresults", "admin_audit"])}
+    except Exception as e:
+        logger.error(f"Cache stats error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Request coalescing metrics
+@api_router.get("/admin/coalescing")
+async def get_coalescing_stats():
+    """Report executed vs coalesced requests per endpoint"""
+    return single_flight.stats()
+
+@api_router.get("/admin/audit-writer")
+async def get_audit_writer_stats():
+    """Report audit writer queue depth, batches written and spilled entries"""
+    return audit_writer.stats()
+
 # Quick filters presets
 @api_router.get("/admin/quick-filters")
 async def get_quick_filters():
@@ -1054,8 +4387,79 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "Content-Disposition", "Content-Range", "Accept-Ranges", "X-Cache", "Age"],
 )
 
+@app.on_event("startup")
+async def start_background_jobs():
+    app.state.index_task = asyncio.create_task(ensure_indexes()) if INDEX_BOOTSTRAP else None
+    app.state.ingest_task = asyncio.create_task(ingest_loop()) if INGEST_ENABLED else None
+    app.state.bitmap_task = asyncio.create_task(bitmap_loop()) if BITMAP_ENABLED else None
+    app.state.analytics_task = asyncio.create_task(analytics_loop()) if ANALYTICS_ENABLED else None
+    app.state.prewarm_task = asyncio.create_task(prewarm_swr_caches())
+    app.state.export_jobs_task = asyncio.create_task(export_jobs_loop())
+    audit_writer.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if app.state.ingest_task:
+        app.state.ingest_task.cancel()
+    if app.state.bitmap_task:
+        app.state.bitmap_task.cancel()
+    if app.state.analytics_task:
+        app.state.analytics_task.cancel()
+    app.state.export_jobs_task.cancel()
+    for task in list(export_job_tasks):
+        task.cancel()
+    if export_job_tasks:
+        await asyncio.gather(*export_job_tasks, return_exceptions=True)
+    # After export jobs, whose cancellation still audits the interrupted export
+    await audit_writer.close()
     client.close()
+
+# ============ CLI ============
+
+cli = typer.Typer(help="SAI Admin Dashboard maintenance commands")
+
+@cli.command("rebuild-snapshot")
+def rebuild_snapshot_command():
+    """Recompute the dashboard_snapshot document from users/testresults"""
+    result = asyncio.run(rebuild_dashboard_snapshot())
+    typer.echo(f"Snapshot rebuilt: {result['users']} users, {result['testresults']} tests")
+
+@cli.command("backfill-search-keys")
+def backfill_search_keys_command():
+    """Build searchKeys for every user that does not have them yet"""
+    async def run():
+        await ensure_indexes()
+        return await backfill_search_keys()
+    typer.echo(f"Search keys written for {asyncio.run(run())} users")
+
+@cli.command("rebuild-test-summary")
+def rebuild_test_summary_command():
+    """Recompute the user_test_summary collection from testresults"""
+    result = asyncio.run(rebuild_user_test_summary())
+    typer.echo(f"Test summary rebuilt for {result['users']} users")
+
+@cli.command("reconcile-filter-catalog")
+def reconcile_filter_catalog_command():
+    """Recompute the filter_catalog collection from users/testresults"""
+    result = asyncio.run(reconcile_filter_catalog())
+    typer.echo(f"Filter catalog reconciled: {result['entries']} entries")
+
+@cli.command("ensure-indexes")
+def ensure_indexes_command():
+    """Create every declared index that does not exist yet"""
+    created = asyncio.run(ensure_indexes())
+    if not created:
+        typer.echo("All indexes present")
+    for collection, names in created.items():
+        typer.echo(f"{collection}: created {', '.join(names)}")
+
+@cli.command("index-report")
+def index_report_command():
+    """Print missing/unused indexes and explain() results as JSON"""
+    typer.echo(json.dumps(asyncio.run(index_report()), indent=2, default=json_default))
+
+if __name__ == "__main__":
+    cli()
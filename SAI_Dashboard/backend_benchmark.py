@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+
+import asyncio
+import inspect
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from pydantic.fields import FieldInfo
+
+# Runs against the same database as the API (MONGO_URL / DB_NAME from backend/.env)
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+import server  # noqa: E402
+
+
+def endpoint_kwargs(fn, **overrides):
+    """Plain default arguments for calling a FastAPI endpoint function directly"""
+    kwargs = {}
+    for name, param in inspect.signature(fn).parameters.items():
+        default = param.default
+        if param.annotation is server.Response:
+            default = server.Response()
+        elif isinstance(default, FieldInfo):
+            default = default.default
+        kwargs[name] = default
+    kwargs.update(overrides)
+    return kwargs
+
+
+class SAIBackendBenchmark:
+    def __init__(self, iterations=20):
+        self.iterations = iterations
+        self.results = []
+
+    async def measure(self, name, fn):
+        """Time an async callable and record p50/p95 latency"""
+        await fn()  # warm-up
+        samples = []
+        for _ in range(self.iterations):
+            start = time.perf_counter()
+            await fn()
+            samples.append((time.perf_counter() - start) * 1000)
+        samples.sort()
+        p50 = statistics.median(samples)
+        p95 = samples[max(0, int(round(len(samples) * 0.95)) - 1)]
+        self.results.append({'name': name, 'p50': p50, 'p95': p95})
+        print(f"⏱️  {name}: p50 {p50:.2f} ms, p95 {p95:.2f} ms")
+        return p50
+
+    async def bench_test_result_enrichment(self):
+        """Per-user find_one (previous /admin/test-results) vs one batched $in"""
+        page = await server.db.testresults.find({}, {"userId": 1}).sort("date", -1).limit(100).to_list(100)
+        user_ids = list(set([r.get("userId") for r in page if r.get("userId")]))
+        print(f"\n🔍 Test result enrichment ({len(user_ids)} distinct users on a 100-row page)")
+
+        async def per_user_lookup():
+            for uid in user_ids:
+                try:
+                    await server.db.users.find_one({"_id": ObjectId(uid)})
+                except Exception:
+                    pass
+
+        async def batched_lookup():
+            await server.fetch_user_map(user_ids)
+
+        before = await self.measure("enrichment before (N+1 find_one)", per_user_lookup)
+        after = await self.measure("enrichment after (batched $in)", batched_lookup)
+        if after > 0:
+            print(f"   Speedup: {before / after:.1f}x")
+
+    async def bench_grouped_query(self):
+        """MongoDB $group vs the columnar analytics snapshot for a grouped /admin/query"""
+        query = server.QueryFilter(
+            filters={},
+            groupBy=["state", "gender", "verification.status"],
+            aggregate=[{"op": "avg", "field": "currentXP"}, {"op": "max", "field": "currentXP"}],
+            limit=100,
+        )
+        print("\n🔍 Grouped query (state × gender × verification status)")
+        execute_query = server.execute_query.__wrapped__  # bypass the result cache
+
+        server.analytics_state.update(snapshot=None, builtAt=None)
+        before = await self.measure("grouped query (MongoDB $group)", lambda: execute_query(query))
+
+        await server.refresh_analytics_snapshot()
+        status = server.analytics_status()
+        print(f"   Snapshot: {status['users']} users, {status['bytes']['total']} bytes, built in {status['buildSeconds']} s")
+        after = await self.measure("grouped query (columnar snapshot)", lambda: execute_query(query))
+        server.analytics_state.update(snapshot=None, builtAt=None)
+        if after > 0:
+            print(f"   Speedup: {before / after:.1f}x")
+
+    async def bench_endpoint_fan_out(self):
+        """Per-endpoint latency with independent queries awaited one by one vs fan_out"""
+        sample = await server.db.users.find_one({}, {"_id": 1})
+        # __wrapped__ bypasses the result / stale-while-revalidate caches
+        endpoints = [
+            ("dashboard (live)", server.get_dashboard_stats.__wrapped__, {"live": True}),
+            ("filter-options", server.get_filter_options.__wrapped__, {}),
+            ("candidates", server.get_candidates.__wrapped__, {}),
+            ("test-results", server.get_test_results.__wrapped__, {}),
+            ("audit", server.get_audit_logs.__wrapped__, {}),
+            ("query", server.execute_query.__wrapped__, {"query": server.QueryFilter(filters={"gender": "Male"})}),
+        ]
+        if sample:
+            endpoints.append(("candidate profile", server.get_candidate, {"candidate_id": str(sample["_id"])}))
+        print(f"\n🔍 Endpoint latency: sequential vs fan_out (limit {server.QUERY_FANOUT_LIMIT})")
+
+        fan_out_limit = server.QUERY_FANOUT_LIMIT
+        for name, fn, overrides in endpoints:
+            def call(fn=fn, overrides=overrides):
+                return fn(**endpoint_kwargs(fn, **overrides))
+            server.QUERY_FANOUT_LIMIT = 1
+            before = await self.measure(f"{name} (sequential)", call)
+            server.QUERY_FANOUT_LIMIT = fan_out_limit
+            after = await self.measure(f"{name} (fan_out)", call)
+            if after > 0:
+                print(f"   Speedup: {before / after:.1f}x")
+
+    async def bench_serialization(self):
+        """serialize_doc + jsonable_encoder + json.dumps vs prepare_doc + render_json on 100-row pages"""
+        pages = [
+            ("users", await server.db.users.find({}).limit(100).to_list(100)),
+            ("testresults", await server.db.testresults.find({}).sort("date", -1).limit(100).to_list(100)),
+        ]
+        print(f"\n🔍 Response serialization (orjson {'enabled' if server.orjson else 'not installed'})")
+
+        for name, docs in pages:
+            def previous(docs=docs):
+                content = {"results": [server.serialize_doc(d) for d in docs]}
+                return json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+            def current(docs=docs):
+                return server.render_json({"results": [server.prepare_doc(d) for d in docs]})
+
+            # orjson may format floats differently (1e16 vs 1e+16), so compare the decoded values
+            identical = json.loads(previous()) == json.loads(current())
+            print(f"   {name}: {len(docs)} docs, {len(current())} bytes, {'✅ same JSON' if identical else '❌ output differs'}")
+
+            async def run_previous(fn=previous):
+                fn()
+
+            async def run_current(fn=current):
+                fn()
+
+            before = await self.measure(f"{name} page (serialize_doc + json)", run_previous)
+            after = await self.measure(f"{name} page (prepare_doc + orjson)", run_current)
+            if after > 0:
+                print(f"   Speedup: {before / after:.1f}x")
+
+    async def bench_response_views(self):
+        """Latency and payload size of full, card and table views per endpoint"""
+        sample = await server.db.users.find_one({}, {"_id": 1})
+        # __wrapped__ bypasses the result cache so every call hits MongoDB
+        endpoints = [
+            ("candidates", server.get_candidates.__wrapped__, {"limit": 100}),
+            ("test-results", server.get_test_results.__wrapped__, {"limit": 100}),
+        ]
+        if sample:
+            endpoints.append(("candidate profile", server.get_candidate, {"candidate_id": str(sample["_id"])}))
+        print("\n🔍 Response views (payload bytes per 100-row page / profile)")
+
+        for name, fn, overrides in endpoints:
+            for view in ("full", "card", "table"):
+                def call(fn=fn, overrides=overrides, view=view):
+                    return fn(**endpoint_kwargs(fn, view=view, **overrides))
+                await self.measure(f"{name} view={view}", call)
+                body = await call()
+                size = len(body.body if isinstance(body, server.Response) else server.render_json(body))
+                print(f"   {name} view={view}: {size} bytes")
+
+        execute_query = server.execute_query.__wrapped__
+        for view in ("full", "card", "table"):
+            query = server.QueryFilter(filters={}, limit=100, view=view)
+            await self.measure(f"query view={view}", lambda query=query: execute_query(query))
+            print(f"   query view={view}: {len(server.render_json(await execute_query(query)))} bytes")
+
+    async def bench_audit_writes(self):
+        """log_audit latency with a direct insert_one vs the buffered audit writer"""
+        print("\n🔍 Audit writes (per log_audit call)")
+
+        def write():
+            return server.log_audit(admin_id="SAI_BENCHMARK", action="benchmark", target_id="bulk", target_type="benchmark")
+
+        before = await self.measure("log_audit (insert_one)", write)
+        server.audit_writer.start()
+        try:
+            after = await self.measure("log_audit (buffered writer)", write)
+        finally:
+            await server.audit_writer.close()
+        stats = server.audit_writer.stats()
+        print(f"   Writer: {stats['written']} entries in {stats['batches']} batches, {stats['spilled']} spilled")
+        await server.db.admin_audit.delete_many({"adminId": "SAI_BENCHMARK"})
+        if after > 0:
+            print(f"   Speedup: {before / after:.1f}x")
+
+
+async def run():
+    print("🚀 Starting SAI Backend Benchmarks")
+    print("=" * 50)
+
+    bench = SAIBackendBenchmark()
+    benchmarks = [
+        bench.bench_test_result_enrichment,
+        bench.bench_grouped_query,
+        bench.bench_endpoint_fan_out,
+        bench.bench_serialization,
+        bench.bench_response_views,
+        bench.bench_audit_writes,
+    ]
+
+    for benchmark in benchmarks:
+        await benchmark()
+
+    print("\n" + "=" * 50)
+    print("📊 BENCHMARK RESULTS")
+    print("=" * 50)
+    for result in bench.results:
+        print(f"{result['name']:<50} p50 {result['p50']:>9.2f} ms   p95 {result['p95']:>9.2f} ms")
+    return 0
+
+
+def main():
+    return asyncio.run(run())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
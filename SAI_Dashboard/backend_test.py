@@ -77,6 +77,10 @@ class SAIBackendTester:
         """Test dashboard statistics"""
         return self.run_test("Dashboard Stats", "GET", "admin/dashboard", 200)
 
+    def test_dashboard_snapshot_rebuild(self):
+        """Test dashboard snapshot full rebuild"""
+        return self.run_test("Dashboard Snapshot Rebuild", "POST", "admin/dashboard/snapshot/rebuild", 200)
+
     def test_candidates_list(self):
         """Test candidates list with pagination"""
         return self.run_test("Candidates List", "GET", "admin/candidates", 200, params={'page': 1, 'limit': 10})
@@ -86,10 +90,39 @@ class SAIBackendTester:
         return self.run_test("Candidates with Filters", "GET", "admin/candidates", 200, 
                            params={'page': 1, 'limit': 5, 'gender': 'Male'})
 
+    def test_candidates_cursor_pagination(self):
+        """Test keyset pagination by following nextCursor"""
+        success, first_page = self.run_test("Candidates First Page", "GET", "admin/candidates", 200,
+                                            params={'limit': 5, 'sort': 'currentXP:desc'})
+        if success and first_page.get('nextCursor'):
+            return self.run_test("Candidates Next Cursor Page", "GET", "admin/candidates", 200,
+                               params={'limit': 5, 'sort': 'currentXP:desc', 'cursor': first_page['nextCursor']})
+        
+        print("⚠️  Skipping cursor page test - no nextCursor returned")
+        return False, {}
+
+    def test_candidates_views(self):
+        """Test table view and fields projections on the candidates list"""
+        success, response = self.run_test("Candidates Table View", "GET", "admin/candidates", 200,
+                                          params={'limit': 5, 'view': 'table'})
+        if success and any('searchKeys' in c for c in response.get('results', [])):
+            print("❌ Table view returned fields outside the view")
+            return False, response
+        self.run_test("Candidates Unknown View", "GET", "admin/candidates", 400, params={'view': 'unknown'})
+        return self.run_test("Candidates Fields", "GET", "admin/candidates", 200,
+                           params={'limit': 5, 'fields': 'name,state'})
+
     def test_filter_options(self):
         """Test filter options endpoint"""
         return self.run_test("Filter Options", "GET", "admin/filter-options", 200)
 
+    def test_filter_catalog_reconcile(self):
+        """Test filter catalog reconciliation and filter options served from it"""
+        success, _ = self.run_test("Filter Catalog Reconcile", "POST", "admin/filter-options/reconcile", 200)
+        if not success:
+            return False, {}
+        return self.test_filter_options()
+
     def test_test_results(self):
         """Test test results endpoint"""
         return self.run_test("Test Results", "GET", "admin/test-results", 200, params={'page': 1, 'limit': 10})
@@ -98,11 +131,28 @@ class SAIBackendTester:
         """Test audit logs endpoint"""
         return self.run_test("Audit Logs", "GET", "admin/audit", 200, params={'page': 1, 'limit': 10})
 
+    def test_audit_writer(self):
+        """Test audit writer stats and that no entries are left spilled"""
+        success, response = self.run_test("Audit Writer", "GET", "admin/audit-writer", 200)
+        if success and response.get('spillBytes'):
+            print(f"⚠️  {response['spillBytes']} bytes of audit entries waiting in {response.get('spillFile')}")
+        return success, response
+
     def test_export_json(self):
         """Test export functionality (JSON)"""
         return self.run_test("Export JSON", "GET", "admin/export", 200, 
                            params={'format': 'json', 'type': 'candidates', 'limit': 5})
 
+    def test_export_job(self):
+        """Test background export job creation and progress"""
+        success, job = self.run_test("Create Export Job", "POST", "admin/export/jobs", 202,
+                                     data={'format': 'csv', 'type': 'candidates', 'limit': 5})
+        if success and job.get('id'):
+            return self.run_test("Export Job Progress", "GET", f"admin/export/jobs/{job['id']}", 200)
+        
+        print("⚠️  Skipping export job progress test - job was not created")
+        return False, {}
+
     def test_query_builder(self):
         """Test query builder with simple query"""
         query_data = {
@@ -115,6 +165,49 @@ class SAIBackendTester:
         }
         return self.run_test("Query Builder", "POST", "admin/query", 200, data=query_data)
 
+    def test_query_test_summary(self):
+        """Test a test-metric query after rebuilding the per-user test summary"""
+        success, _ = self.run_test("Test Summary Rebuild", "POST", "admin/test-summary/rebuild", 200)
+        if not success:
+            return False, {}
+        query_data = {
+            "filters": {"testFilter.800m Run.speed": {"$gt": 2}},
+            "page": 1,
+            "limit": 5
+        }
+        return self.run_test("Query via Test Summary", "POST", "admin/query", 200, data=query_data)
+
+    def test_bitmap_index(self):
+        """Test bitmap index refresh and a test-metric query answered from it"""
+        success, status = self.run_test("Bitmap Index Refresh", "POST", "admin/bitmap-index/refresh", 200)
+        if not success:
+            return False, {}
+        print(f"   Bitmap index: {status.get('keys')} keys, {(status.get('bytes') or {}).get('total')} bytes")
+        query_data = {
+            "filters": {"testFilter.800m Run.speed": {"$gt": 2, "$lte": 6}},
+            "page": 1,
+            "limit": 5
+        }
+        return self.run_test("Query via Bitmap Index", "POST", "admin/query", 200, data=query_data)
+
+    def test_result_cache(self):
+        """Test that a repeated query is served from the result cache"""
+        query_data = {"filters": {"gender": "Female"}, "page": 1, "limit": 5}
+        self.run_test("Query (cache fill)", "POST", "admin/query", 200, data=query_data)
+        self.run_test("Query (cache hit)", "POST", "admin/query", 200, data=query_data)
+        success, stats = self.run_test("Result Cache Stats", "GET", "admin/cache", 200)
+        if success:
+            print(f"   Cache: {stats.get('hits')} hits, {stats.get('misses')} misses, {stats.get('bytes')} bytes")
+        return success, stats
+
+    def test_request_coalescing(self):
+        """Test that coalescing metrics are reported for the dashboard"""
+        self.run_test("Dashboard (coalescing)", "GET", "admin/dashboard", 200)
+        success, stats = self.run_test("Coalescing Stats", "GET", "admin/coalescing", 200)
+        if success:
+            print(f"   Backend: {stats.get('backend')}, endpoints: {stats.get('endpoints')}")
+        return success, stats
+
     def test_candidate_profile(self):
         """Test individual candidate profile - need to get a valid ID first"""
         # First get candidates list to get a valid ID
@@ -144,6 +237,44 @@ class SAIBackendTester:
         print("⚠️  Skipping Verification test - no valid candidate ID found")
         return False, {}
 
+    def test_verification_version_conflict(self):
+        """Test that a stale expectedVersion is rejected with 409"""
+        success, candidates_data = self.run_test("Get Candidates for Version Check", "GET", "admin/candidates", 200, params={'limit': 1})
+        if success and candidates_data.get('results'):
+            candidate_id = candidates_data['results'][0].get('id')
+            verification_data = {"action": "verified", "note": "Test version check from backend test", "adminId": "SAI_ADMIN_001"}
+            success, response = self.run_test("Unversioned Verification", "PATCH", f"admin/candidates/{candidate_id}/verify", 200, data=verification_data)
+            if success:
+                version = response['verification']['version']
+                self.run_test("Versioned Verification", "PATCH", f"admin/candidates/{candidate_id}/verify", 200,
+                              data={**verification_data, "expectedVersion": version})
+                return self.run_test("Stale Version Verification", "PATCH", f"admin/candidates/{candidate_id}/verify", 409,
+                                   data={**verification_data, "expectedVersion": version})
+            return success, response
+        
+        print("⚠️  Skipping Version Conflict test - no valid candidate ID found")
+        return False, {}
+
+    def test_bulk_verification(self):
+        """Test bulk verification with per-item results for unknown ids"""
+        success, candidates_data = self.run_test("Get Candidates for Bulk Verification", "GET", "admin/candidates", 200, params={'limit': 3})
+        if success and candidates_data.get('results'):
+            candidate_ids = [c['id'] for c in candidates_data['results']]
+            bulk_data = {
+                "candidateIds": candidate_ids + ["not-an-id"],
+                "action": "verified",
+                "note": "Test bulk verification from backend test",
+                "adminId": "SAI_ADMIN_001"
+            }
+            success, response = self.run_test("Bulk Verification", "PATCH", "admin/candidates/verify-bulk", 200, data=bulk_data)
+            if success and response.get('updated') != len(candidate_ids):
+                print(f"❌ Expected {len(candidate_ids)} updated, got {response.get('updated')}")
+                return False, response
+            return success, response
+        
+        print("⚠️  Skipping Bulk Verification test - no candidates found")
+        return False, {}
+
 def main():
     print("🚀 Starting SAI Backend API Tests")
     print("=" * 50)
@@ -154,15 +285,27 @@ def main():
     test_methods = [
         tester.test_root_endpoint,
         tester.test_dashboard_stats,
+        tester.test_dashboard_snapshot_rebuild,
         tester.test_candidates_list,
         tester.test_candidates_with_filters,
+        tester.test_candidates_cursor_pagination,
+        tester.test_candidates_views,
         tester.test_filter_options,
+        tester.test_filter_catalog_reconcile,
         tester.test_test_results,
         tester.test_audit_logs,
+        tester.test_audit_writer,
         tester.test_export_json,
+        tester.test_export_job,
         tester.test_query_builder,
+        tester.test_query_test_summary,
+        tester.test_bitmap_index,
+        tester.test_result_cache,
+        tester.test_request_coalescing,
         tester.test_candidate_profile,
         tester.test_verification_action,
+        tester.test_verification_version_conflict,
+        tester.test_bulk_verification,
     ]
     
     for test_method in test_methods:
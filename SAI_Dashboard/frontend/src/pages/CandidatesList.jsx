@@ -274,6 +274,7 @@ const CandidatesList = () => {
         page,
         limit,
         sort,
+        view: 'table',
       };
       
       if (search) params.search = search;
@@ -147,7 +147,7 @@ const TestResults = () => {
   const fetchResults = useCallback(async () => {
     try {
       setLoading(true);
-      const params = { page, limit, sort };
+      const params = { page, limit, sort, view: 'table' };
 
       if (search) params.search = search;
       if (testName && testName !== 'all') params.testName = testName;